@@ -1,8 +1,70 @@
 import numpy as np
 import open3d as o3d
 import time
-import random
-from threading import Thread
+import queue
+import traceback
+from threading import Thread, Event
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+from config import DetectionConfig
+
+try:
+    from numba import njit
+except ImportError:  # 未安装numba时使用SciPy连通分量实现
+    njit = None
+
+# 模拟无人机点数：主体点数与每条臂的点数（共4条臂）
+DRONE_BODY_POINTS = 50
+DRONE_ARM_POINTS = 20
+
+# DBSCAN聚类扩展（CSR邻接表：点 i 的邻居为 indices[indptr[i]:indptr[i + 1]]）
+def _dbscan_expand_scipy(indptr, indices, core_mask):
+    """由核心点之间的连通分量得到聚类，返回每个点的聚类标签（-1为噪声）"""
+    n = core_mask.shape[0]
+    labels = np.full(n, -1, dtype=np.int32)
+    core = np.flatnonzero(core_mask)
+    if len(core) == 0:
+        return labels
+    graph = csr_matrix((np.ones(len(indices), dtype=np.int8), indices, indptr), shape=(n, n))
+    labels[core] = connected_components(graph[core][:, core], directed=False)[1]
+    # 边界点（非核心点）归入任一相邻核心点所在的聚类
+    rows = np.repeat(np.arange(n), np.diff(indptr))
+    border = ~core_mask[rows] & core_mask[indices]
+    labels[rows[border]] = labels[indices[border]]
+    return labels
+
+if njit is not None:
+    @njit(cache=True)
+    def _dbscan_expand(indptr, indices, core_mask):
+        """编译版从核心点出发扩展聚类，参数同 _dbscan_expand_scipy"""
+        n = core_mask.shape[0]
+        labels = np.full(n, -1, dtype=np.int32)
+        # 每个点在入栈时即被标记，最多入栈一次
+        stack = np.empty(n, dtype=np.int32)
+        cid = 0
+        for i in range(n):
+            if labels[i] != -1 or not core_mask[i]:
+                continue
+            labels[i] = cid
+            stack[0] = i
+            top = 1
+            while top > 0:
+                top -= 1
+                p = stack[top]
+                # 只有核心点才继续扩展邻域
+                if not core_mask[p]:
+                    continue
+                for k in range(indptr[p], indptr[p + 1]):
+                    q = indices[k]
+                    if labels[q] == -1:
+                        labels[q] = cid
+                        stack[top] = q
+                        top += 1
+            cid += 1
+        return labels
+else:
+    _dbscan_expand = _dbscan_expand_scipy
 
 # 激光雷达原始数据类（存储单帧点云数据）
 class LidarPointCloud:
@@ -13,12 +75,33 @@ class LidarPointCloud:
 
 # 激光雷达SDK模拟类（实际使用时替换为真实SDK）
 class LidarSDK:
-    def __init__(self, ip="127.0.0.1", port=5000):
+    def __init__(self, ip="127.0.0.1", port=5000, seed=None):
         self.connected = False
         self.ip = ip
         self.port = port
         self.latest_cloud = None  # 存储最新的原始点云数据
         self.running = False
+        self._new_data = Event()  # 有新数据时置位，供消费者阻塞等待
+        
+        # 模拟数据统一使用同一个随机数生成器
+        self.rng = np.random.default_rng(seed)
+        
+        # 背景噪声点在启动时生成一次，每帧复用
+        self.num_background_points = 2000
+        self._bg_points = self.rng.uniform(
+            low=[-10, -10, -1], high=[10, 10, 10],  # 高度范围 -1~10
+            size=(self.num_background_points, 3)).astype(np.float32)
+        # 背景点的反射强度（较低且随机）
+        self._bg_intensities = self.rng.uniform(
+            10, 50, self.num_background_points).astype(np.float32)
+
+        # 预分配帧合成缓冲区，背景部分只写入一次
+        self.max_drone_points = DRONE_BODY_POINTS + 4 * DRONE_ARM_POINTS
+        buf_size = self.num_background_points + self.max_drone_points
+        self._buf_points = np.empty((buf_size, 3), dtype=np.float32)
+        self._buf_intensities = np.empty(buf_size, dtype=np.float32)
+        self._buf_points[:self.num_background_points] = self._bg_points
+        self._buf_intensities[:self.num_background_points] = self._bg_intensities
         
     def connect(self):
         """连接到激光雷达"""
@@ -49,8 +132,12 @@ class LidarSDK:
             self.thread.join()
         print("已停止获取点云数据")
         
-    def get_latest_raw_data(self):
-        """获取最新的原始点云数据"""
+    def get_latest_raw_data(self, block=False, timeout=None):
+        """获取最新的原始点云数据（block=True时等待新一帧，超时返回None）"""
+        if block:
+            if not self._new_data.wait(timeout):
+                return None
+            self._new_data.clear()
         return self.latest_cloud
         
     def _data_acquisition_loop(self):
@@ -59,6 +146,7 @@ class LidarSDK:
             # 生成模拟的原始点云数据（实际使用时替换为真实SDK的数据获取）
             raw_data = self._generate_simulated_raw_data()
             self.latest_cloud = raw_data
+            self._new_data.set()
             time.sleep(0.1)  # 10Hz的数据率
             
     def _generate_simulated_raw_data(self):
@@ -66,22 +154,23 @@ class LidarSDK:
         cloud = LidarPointCloud()
         cloud.timestamp = time.time()
         
-        # 生成背景噪声点
-        num_background_points = 2000
-        x = np.random.uniform(-10, 10, num_background_points)
-        y = np.random.uniform(-10, 10, num_background_points)
-        z = np.random.uniform(-1, 10, num_background_points)  # 高度范围
-        cloud.points = np.column_stack([x, y, z])
-        
-        # 背景点的反射强度（较低且随机）
-        cloud.intensities = np.random.uniform(10, 50, num_background_points)
+        # 在合成缓冲区中拼接本帧数据，缓冲区前部已预先写入背景噪声点
+        buf_points = self._buf_points
+        buf_intensities = self._buf_intensities
+        num_points = self.num_background_points
         
         # 随机决定是否添加无人机点云（30%的概率）
-        if random.random() < 1:
+        if self.rng.random() < 1:
             drone_points, drone_intensities = self._generate_drone_raw_data()
-            # 合并背景和无人机数据
-            cloud.points = np.vstack([cloud.points, drone_points])
-            cloud.intensities = np.hstack([cloud.intensities, drone_intensities])
+            # 将无人机数据直接写入背景之后的缓冲区
+            end = num_points + len(drone_points)
+            buf_points[num_points:end] = drone_points
+            buf_intensities[num_points:end] = drone_intensities
+            num_points = end
+        
+        # 发布时拷贝出本帧数据：返回的点云归调用方所有，不会被之后的帧覆盖
+        cloud.points = buf_points[:num_points].copy()
+        cloud.intensities = buf_intensities[:num_points].copy()
             
         return cloud
         
@@ -89,51 +178,36 @@ class LidarSDK:
         """生成模拟的四轴无人机原始点云数据"""
         # 无人机主体（一个长方体）
         body_size = [0.3, 0.3, 0.1]  # 无人机主体尺寸
-        num_body_points = 50
+        num_body_points = DRONE_BODY_POINTS
         
         # 随机位置（在5-15米范围内）
-        x_center = random.uniform(5, 15)
-        y_center = random.uniform(-5, 5)
-        z_center = random.uniform(1, 8)
+        center = self.rng.uniform(low=[5, -5, 1], high=[15, 5, 8])
         
-        # 主体点云
-        body_x = x_center + np.random.uniform(-body_size[0]/2, body_size[0]/2, num_body_points)
-        body_y = y_center + np.random.uniform(-body_size[1]/2, body_size[1]/2, num_body_points)
-        body_z = z_center + np.random.uniform(-body_size[2]/2, body_size[2]/2, num_body_points)
+        # 主体点云（一次生成 (N, 3) 数组）
+        half_size = np.array(body_size) / 2
+        body = center + self.rng.uniform(-half_size, half_size, size=(num_body_points, 3))
         
         # 四个螺旋桨臂
         arm_length = 0.25
-        num_arm_points = 20
-        
-        # 右前臂
-        arm1_x = x_center + np.linspace(0, arm_length, num_arm_points)
-        arm1_y = y_center + np.linspace(0, arm_length*0.3, num_arm_points)
-        arm1_z = z_center + np.random.normal(0, 0.02, num_arm_points)
-        
-        # 左前臂
-        arm2_x = x_center + np.linspace(0, arm_length, num_arm_points)
-        arm2_y = y_center - np.linspace(0, arm_length*0.3, num_arm_points)
-        arm2_z = z_center + np.random.normal(0, 0.02, num_arm_points)
+        num_arm_points = DRONE_ARM_POINTS
         
-        # 右后臂
-        arm3_x = x_center - np.linspace(0, arm_length, num_arm_points)
-        arm3_y = y_center + np.linspace(0, arm_length*0.3, num_arm_points)
-        arm3_z = z_center + np.random.normal(0, 0.02, num_arm_points)
+        # 四条臂的方向：右前、左前、右后、左后（x方向符号，y方向斜率）
+        arm_dirs = np.array([[1, 0.3], [1, -0.3], [-1, 0.3], [-1, -0.3]])
+        t = np.linspace(0, arm_length, num_arm_points)
         
-        # 左后臂
-        arm4_x = x_center - np.linspace(0, arm_length, num_arm_points)
-        arm4_y = y_center - np.linspace(0, arm_length*0.3, num_arm_points)
-        arm4_z = z_center + np.random.normal(0, 0.02, num_arm_points)
+        # 广播一次生成全部臂上的点 (4 * num_arm_points, 3)
+        arms_xy = (arm_dirs[:, None, :] * t[None, :, None]).reshape(-1, 2) + center[:2]
+        arms_z = center[2] + self.rng.normal(0, 0.02, 4 * num_arm_points)
+        arms = np.column_stack([arms_xy, arms_z])
         
         # 合并所有点
-        x = np.concatenate([body_x, arm1_x, arm2_x, arm3_x, arm4_x])
-        y = np.concatenate([body_y, arm1_y, arm2_y, arm3_y, arm4_y])
-        z = np.concatenate([body_z, arm1_z, arm2_z, arm3_z, arm4_z])
+        points = np.concatenate([body, arms])
         
         # 无人机的反射强度（通常比背景高）
-        intensities = np.random.uniform(80, 200, len(x))
+        intensities = self.rng.uniform(80, 200, len(points))
         
-        return np.column_stack([x, y, z]), intensities
+        return (points.astype(np.float32, copy=False),
+                intensities.astype(np.float32, copy=False))
 
 # 无人机检测器类
 class DroneDetector:
@@ -143,164 +217,275 @@ class DroneDetector:
         self.dbscan_eps = 0.3   # DBSCAN聚类半径
         self.dbscan_min_points = 15  # 最小聚类点数
         self.min_intensity = 60  # 无人机反射强度最小值
+        self.outlier_voxel_size = 0.2  # 离群点检测的体素大小
+        self.outlier_min_points = 2  # 体素内少于该点数则视为离群点
         self.drone_size_range = {  # 无人机尺寸范围（米）
             'min_x': 0, 'max_x': 0.5,
             'min_y': 0, 'max_y': 0.5,
             'min_z': 0, 'max_z': 0.5,
             'min_points': 50, 'max_points': 300
         }
+
+        # 批处理参数：累计 batch_size 帧后一起聚类，摊薄每帧的固定开销
+        self.batch_size = 1
+        self.min_track_frames = 1  # 无人机候选需在批内至少出现的帧数（1为不做多帧一致性检查）
+        self.track_distance = 1.0  # 多帧之间视为同一目标的聚类中心距离（米）
+        self._pending_frames = []  # 已预处理、等待批量检测的帧
+        self._neighbor_cache = None  # (点坐标, indptr, indices)，点云与上一次完全相同时复用
+        
+        # 全局设置一次Open3D日志级别，屏蔽处理过程中的提示输出
+        o3d.utility.set_verbosity_level(o3d.utility.VerbosityLevel.Error)
         
     def raw_data_to_point_cloud(self, raw_data):
         """将原始点数据转换为Open3D点云对象"""
         if raw_data is None or raw_data.points is None:
             return None
             
+        # 中间计算保持float32，仅在传给Open3D时转换为float64
         pcd = o3d.geometry.PointCloud()
-        pcd.points = o3d.utility.Vector3dVector(raw_data.points)
+        pcd.points = o3d.utility.Vector3dVector(raw_data.points.astype(np.float64))
         
         # 如果有反射强度，将其存储为颜色信息（用于可视化）
         if raw_data.intensities is not None:
-            # 归一化反射强度到[0,1]范围，作为灰度值
-            normalized_intensity = (raw_data.intensities - raw_data.intensities.min()) / \
-                                 (raw_data.intensities.max() - raw_data.intensities.min() + 1e-6)
-            # 转换为RGB（这里用灰度表示）
-            colors = np.column_stack([normalized_intensity, normalized_intensity, normalized_intensity])
-            pcd.colors = o3d.utility.Vector3dVector(colors)
+            # 归一化反射强度到[0,1]范围，作为灰度值（在副本上原地运算）
+            normalized_intensity = raw_data.intensities.astype(np.float32)
+            intensity_range = np.ptp(normalized_intensity)
+            normalized_intensity -= normalized_intensity.min()
+            if intensity_range > 0:
+                normalized_intensity /= intensity_range
+            # 转换为RGB（灰度广播为三通道视图，传给Open3D时才分配一次）
+            colors = np.broadcast_to(normalized_intensity[:, None],
+                                     (len(normalized_intensity), 3))
+            pcd.colors = o3d.utility.Vector3dVector(colors.astype(np.float64))
             
         return pcd
         
-    def preprocess_point_cloud(self, pcd, intensities=None):
-        """预处理点云数据"""
-        # 体素滤波降采样
+    def preprocess_point_cloud(self, raw_data):
+        """预处理点云数据（距离/高度/强度过滤 -> 体素滤波降采样 -> 移除离群点）"""
+        points = raw_data.points
+        intensities = raw_data.intensities
+        
+        # 先在NumPy数组上按水平距离和高度过滤（比较平方距离，无需开方）
+        xy = points[:, :2]
+        dist_sq = np.einsum('ij,ij->i', xy, xy)
+        keep = ((dist_sq >= DetectionConfig.DETECTION_DISTANCE_MIN ** 2) &
+                (dist_sq <= DetectionConfig.DETECTION_DISTANCE_MAX ** 2) &
+                (points[:, 2] >= DetectionConfig.MIN_HEIGHT))
+        
+        # 过滤低强度点（可能是噪声），保持强度与点一一对应
+        if intensities is not None and len(intensities) == len(points):
+            keep &= intensities > self.min_intensity
+        else:
+            intensities = None
+        
+        filtered = LidarPointCloud()
+        filtered.points = points[keep]
+        filtered.intensities = intensities[keep] if intensities is not None else None
+        filtered.timestamp = raw_data.timestamp
+        raw_data = filtered
+        
+        if len(raw_data.points) == 0:
+            return o3d.geometry.PointCloud()
+        
+        # 由保留的点构建一次点云，再做体素滤波降采样
+        pcd = self.raw_data_to_point_cloud(raw_data)
         down_pcd = pcd.voxel_down_sample(voxel_size=self.voxel_size)
         #o3d.visualization.draw_geometries([down_pcd])
-
-        # 如果有反射强度信息，过滤低强度点（可能是噪声）
-        if intensities is not None and len(intensities) == len(pcd.points):
-            # 找到降采样后保留的点的索引
-            # 注意：这里是简化处理，实际需要更精确的索引映射
-            if len(down_pcd.points) < len(pcd.points):
-                # 简单随机保留相同比例的高强度点（实际应用需改进）
-                high_intensity_mask = intensities > self.min_intensity
-                high_intensity_indices = np.where(high_intensity_mask)[0]
-                down_pcd = pcd.select_by_index(high_intensity_indices)
-        
-        # 移除离群点
-        cl, ind = down_pcd.remove_statistical_outlier(nb_neighbors=20, std_ratio=2.0)
-        filtered_pcd = down_pcd.select_by_index(ind)
+        
+        # 按体素占据点数移除离群点（孤立体素中的点视为噪声）
+        pts = np.asarray(down_pcd.points)
+        voxel_coords = np.floor(pts / self.outlier_voxel_size).astype(np.int32)
+        _, inverse, voxel_counts = np.unique(voxel_coords, axis=0,
+                                             return_inverse=True, return_counts=True)
+        keep = voxel_counts[inverse.reshape(-1)] >= self.outlier_min_points
+        filtered_pcd = down_pcd.select_by_index(np.flatnonzero(keep))
         #o3d.visualization.draw_geometries([filtered_pcd])
-        #return filtered_pcd
-        return pcd
+        return filtered_pcd
         
     def detect_drones(self, raw_data):
         """从原始数据中检测无人机"""
         if raw_data is None or raw_data.points is None or len(raw_data.points) == 0:
             return [], None
         
-        # 转换为Open3D点云
-        pcd = self.raw_data_to_point_cloud(raw_data)
-        #o3d.visualization.draw_geometries([pcd])
-        # 预处理
-        processed_pcd = self.preprocess_point_cloud(pcd, raw_data.intensities)
+        # 预处理（内部转换为Open3D点云）
+        processed_pcd = self.preprocess_point_cloud(raw_data)
         #o3d.visualization.draw_geometries([processed_pcd])
-        if len(processed_pcd.points) < 10:
-            return [], processed_pcd
+        return self._detect_processed([processed_pcd])[0]
         
-        # 使用DBSCAN进行聚类
-        with o3d.utility.VerbosityContextManager(
-                o3d.utility.VerbosityLevel.Error) as cm:
-            labels = np.array(
-                processed_pcd.cluster_dbscan(eps=self.dbscan_eps, min_points=self.dbscan_min_points, print_progress=False))
+    def push_frame(self, raw_data):
+        """加入一帧数据，累计满 batch_size 帧后批量检测并返回每帧结果，否则返回None"""
+        # 立即预处理，批内只保存预处理后的点云
+        if raw_data is None or raw_data.points is None or len(raw_data.points) == 0:
+            self._pending_frames.append(None)
+        else:
+            self._pending_frames.append(self.preprocess_point_cloud(raw_data))
+        if len(self._pending_frames) < self.batch_size:
+            return None
+        processed, self._pending_frames = self._pending_frames, []
+        return self._detect_processed(processed)
+        
+    def _detect_processed(self, processed_frames):
+        """对一批预处理后的点云一起聚类，按帧返回 (无人机点云列表, 预处理后点云)"""
+        drone_clusters = [[] for _ in processed_frames]
+        results = list(zip(drone_clusters, processed_frames))
+        
+        # 合并各帧点云，点数过少的帧不参与聚类
+        frame_pts = []
+        for pcd in processed_frames:
+            pts = np.asarray(pcd.points) if pcd is not None else np.empty((0, 3))
+            frame_pts.append(pts if len(pts) >= 10 else pts[:0])
+        frame_ids = np.repeat(np.arange(len(frame_pts)), [len(p) for p in frame_pts])
+        pts = np.concatenate(frame_pts)
+        if len(pts) == 0:
+            return results
+        
+        # 使用基于KD树的DBSCAN进行聚类
+        # 附加帧号维度，使不同帧的点相距超过eps，邻域不会跨帧
+        labels = self._cluster_dbscan(
+            np.column_stack([pts, frame_ids * (2.0 * self.dbscan_eps)]))
         
         max_label = labels.max()
         print(f"检测到 {max_label + 1} 个聚类")
         
-        # 提取每个聚类并判断是否为无人机
-        drone_clusters = []
-        for label in range(max_label + 1):
-            cluster_indices = np.where(labels == label)[0]
-            cluster_pcd = processed_pcd.select_by_index(cluster_indices)
-            
-            # 分析聚类特征
-            if self._is_drone(cluster_pcd):
-                drone_clusters.append(cluster_pcd)
-        
-        return drone_clusters, processed_pcd
-        
-    def _is_drone(self, cluster_pcd):
-        """判断聚类是否为无人机"""
-        # 获取点云边界框
-        bbox = cluster_pcd.get_axis_aligned_bounding_box()
-        min_bound = bbox.min_bound
-        max_bound = bbox.max_bound
-        
-        # 计算尺寸
-        size_x = max_bound[0] - min_bound[0]
-        size_y = max_bound[1] - min_bound[1]
-        size_z = max_bound[2] - min_bound[2]
-        num_points = len(cluster_pcd.points)
+        if max_label < 0:
+            return results
+        
+        # 按标签分组后分段归约，一次性得到所有聚类的边界框和点数
+        order, boundaries = self._group_clusters(labels, max_label)
+        sorted_pts = pts[order]
+        starts = boundaries[:-1]
+        mins = np.minimum.reduceat(sorted_pts, starts, axis=0)
+        maxs = np.maximum.reduceat(sorted_pts, starts, axis=0)
+        counts = np.diff(boundaries)
+        is_drone = self._is_drone(maxs - mins, counts)
+        cluster_frames = frame_ids[order[starts]]
+        
+        # 多帧一致性检查：剔除只在个别帧中出现的候选
+        if self.min_track_frames > 1:
+            candidates = np.flatnonzero(is_drone)
+            centers = (mins[candidates] + maxs[candidates]) / 2
+            is_drone[candidates] = self._is_consistent(centers, cluster_frames[candidates])
+        
+        # 只为判定为无人机的聚类构建点云（直接切片已排序的坐标数组）
+        for label in np.flatnonzero(is_drone):
+            cluster_pcd = o3d.geometry.PointCloud()
+            cluster_pcd.points = o3d.utility.Vector3dVector(
+                sorted_pts[boundaries[label]:boundaries[label + 1]])
+            drone_clusters[cluster_frames[label]].append(cluster_pcd)
+        
+        return results
+        
+    def _is_consistent(self, centers, frames):
+        """判断各候选中心附近是否在至少 min_track_frames 个帧中出现过候选"""
+        if len(centers) == 0:
+            return np.zeros(0, dtype=bool)
+        neighbors = cKDTree(centers).query_ball_point(centers, r=self.track_distance)
+        return np.fromiter((len(np.unique(frames[nb])) >= self.min_track_frames
+                            for nb in neighbors), dtype=bool, count=len(centers))
+        
+    def _cluster_dbscan(self, pts):
+        """基于KD树邻域查询的DBSCAN聚类，返回每个点的聚类标签（-1为噪声）"""
+        indptr, indices = self._neighbor_graph(pts)
+        
+        # 邻域点数包含自身
+        core_mask = np.diff(indptr) + 1 >= self.dbscan_min_points
+        return _dbscan_expand(indptr, indices, core_mask)
+        
+    def _neighbor_graph(self, pts):
+        """构建邻域图（CSR邻接表），点坐标与上一次完全相同时直接复用"""
+        n = len(pts)
+        # 按精确坐标比较（而非体素量化），保证聚类结果与缓存状态无关
+        cache = self._neighbor_cache
+        if cache is not None and np.array_equal(cache[0], pts):
+            return cache[1], cache[2]
+        
+        # 一次性查询所有距离小于eps的点对，并转换为CSR邻接表
+        tree = cKDTree(pts)
+        pairs = tree.query_pairs(r=self.dbscan_eps, output_type='ndarray')
+        src = np.concatenate([pairs[:, 0], pairs[:, 1]])
+        dst = np.concatenate([pairs[:, 1], pairs[:, 0]])
+        indices = dst[np.argsort(src, kind='stable')].astype(np.int32)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        
+        self._neighbor_cache = (pts.copy(), indptr, indices)
+        return indptr, indices
+        
+    def _group_clusters(self, labels, max_label):
+        """对标签做一次稳定排序分组，返回去除噪声后的点索引及各聚类在其中的边界"""
+        order = np.argsort(labels, kind='stable')
+        order = order[labels[order] >= 0]
+        # 第 i 个聚类的点索引为 order[boundaries[i]:boundaries[i + 1]]
+        boundaries = np.searchsorted(labels[order], np.arange(max_label + 2))
+        return order, boundaries
+        
+    def _is_drone(self, sizes, counts):
+        """根据边界框尺寸 (K, 3) 和点数 (K,) 批量判断各聚类是否为无人机"""
+        r = self.drone_size_range
+        size_x, size_y, size_z = sizes[:, 0], sizes[:, 1], sizes[:, 2]
         
         # 检查是否在无人机尺寸范围内
-        if (self.drone_size_range['min_x'] <= size_x <= self.drone_size_range['max_x'] and
-            self.drone_size_range['min_y'] <= size_y <= self.drone_size_range['max_y'] and
-            self.drone_size_range['min_z'] <= size_z <= self.drone_size_range['max_z'] and
-            self.drone_size_range['min_points'] <= num_points <= self.drone_size_range['max_points']):
-            return True
-        
-        return False
+        return ((r['min_x'] <= size_x) & (size_x <= r['max_x']) &
+                (r['min_y'] <= size_y) & (size_y <= r['max_y']) &
+                (r['min_z'] <= size_z) & (size_z <= r['max_z']) &
+                (r['min_points'] <= counts) & (counts <= r['max_points']))
 
 # 可视化器类
 class Visualizer:
-    def __init__(self):
+    def __init__(self, max_drones=10):
         self.vis = o3d.visualization.Visualizer()
         self.vis.create_window(window_name="激光雷达无人机检测系统")
         
         # 初始化几何对象
         self.pcd_background = o3d.geometry.PointCloud()
-        self.pcd_drones = []  # 存储无人机点云列表
-        self.bboxes = []      # 存储边界框列表（修复：初始化边界框列表）
+        # 预先创建固定数量的无人机点云和边界框，每帧原地更新
+        self.drone_pool = [o3d.geometry.PointCloud() for _ in range(max_drones)]
+        self.bbox_pool = [o3d.geometry.AxisAlignedBoundingBox() for _ in range(max_drones)]
+        self.num_drones_shown = 0  # 当前正在显示的无人机数量
         self.coordinate_frame = o3d.geometry.TriangleMesh.create_coordinate_frame(
             size=10.0, origin=[0, 0, 0]
         )
         
-        # 初始添加几何对象到可视化器
+        # 初始添加几何对象到可视化器（之后只更新，不再添加/移除）
         self.vis.add_geometry(self.coordinate_frame)
-        self.vis.add_geometry(self.pcd_background)  # 修复：初始添加背景点云，避免首次移除错误
+        self.vis.add_geometry(self.pcd_background)
+        for drone_pcd, bbox in zip(self.drone_pool, self.bbox_pool):
+            self.vis.add_geometry(drone_pcd, reset_bounding_box=False)
+            self.vis.add_geometry(bbox, reset_bounding_box=False)
         
     def update_visualization(self, background_pcd, drone_clusters):
         """更新可视化内容"""
-        # 清除之前的点云
-        self.vis.remove_geometry(self.pcd_background, reset_bounding_box=False)
-        
-        # 移除所有无人机点云
-        for drone_pcd in self.pcd_drones:
-            self.vis.remove_geometry(drone_pcd, reset_bounding_box=False)
-        
-        # 移除所有边界框（修复：独立循环，避免重复移除）
-        for bbox in self.bboxes:
-            self.vis.remove_geometry(bbox, reset_bounding_box=False)
-        
-        # 更新背景点云
-        self.pcd_background = background_pcd
-        # 如果没有颜色信息，设置为灰色
-        if not self.pcd_background.has_colors():
+        # 原地更新背景点云，不再每帧移除/添加几何对象
+        self.pcd_background.points = background_pcd.points
+        if background_pcd.has_colors():
+            self.pcd_background.colors = background_pcd.colors
+        else:
+            # 如果没有颜色信息，设置为灰色
             self.pcd_background.paint_uniform_color([0.5, 0.5, 0.5])
-        self.vis.add_geometry(self.pcd_background, reset_bounding_box=False)
-        
-        # 更新无人机点云（红色）和边界框
-        self.pcd_drones = []  # 清空旧数据
-        self.bboxes = []      # 清空旧边界框
-        for cluster in drone_clusters:
-            drone_pcd = cluster
-            drone_pcd.paint_uniform_color([1.0, 0.0, 0.0])  # 红色标识无人机
-            self.vis.add_geometry(drone_pcd, reset_bounding_box=False)
-            self.pcd_drones.append(drone_pcd)
-            
-            # 添加轴对齐边界框
-            bbox = drone_pcd.get_axis_aligned_bounding_box()
-            bbox.color = (1, 0, 0)  # 红色边界框
-            self.vis.add_geometry(bbox, reset_bounding_box=False)
-            self.bboxes.append(bbox)
+        self.vis.update_geometry(self.pcd_background)
+        
+        # 更新无人机点云（红色）和边界框，超出预分配数量的目标不显示
+        num_drones = min(len(drone_clusters), len(self.drone_pool))
+        for i in range(max(num_drones, self.num_drones_shown)):
+            drone_pcd = self.drone_pool[i]
+            bbox = self.bbox_pool[i]
+            if i < num_drones:
+                cluster = drone_clusters[i]
+                drone_pcd.points = cluster.points
+                drone_pcd.paint_uniform_color([1.0, 0.0, 0.0])  # 红色标识无人机
+                
+                # 轴对齐边界框
+                cluster_bbox = cluster.get_axis_aligned_bounding_box()
+                bbox.min_bound = cluster_bbox.min_bound
+                bbox.max_bound = cluster_bbox.max_bound
+                bbox.color = (1, 0, 0)  # 红色边界框
+            else:
+                # 清空上一帧用过、本帧不再需要的槽位
+                drone_pcd.clear()
+                bbox.clear()
+            self.vis.update_geometry(drone_pcd)
+            self.vis.update_geometry(bbox)
+        self.num_drones_shown = num_drones
         
         # 更新视图
         self.vis.poll_events()   # 处理交互事件（如鼠标操作）
@@ -310,12 +495,62 @@ class Visualizer:
         """关闭可视化窗口"""
         self.vis.destroy_window()
 
+def _put_latest(q, item):
+    """向容量为1的队列放入最新数据，丢弃尚未被取走的旧数据"""
+    try:
+        q.get_nowait()
+    except queue.Empty:
+        pass
+    q.put_nowait(item)
+
 # 主程序
 def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="激光雷达无人机检测系统")
+    parser.add_argument("--no-viz", action="store_true", help="不创建可视化窗口（无界面运行）")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="每批检测的帧数，每批只显示最新一帧的检测结果 (默认: 1)")
+    parser.add_argument("--min-track-frames", type=int, default=1,
+                        help="无人机需在批内出现的最少帧数，不能超过 --batch-size (默认: 1，不做多帧检查)")
+    args = parser.parse_args()
+    if args.batch_size < 1:
+        parser.error("--batch-size 必须至少为 1")
+    if not 1 <= args.min_track_frames <= args.batch_size:
+        parser.error("--min-track-frames 必须在 1 到 --batch-size 之间")
+    
     # 初始化组件
     lidar = LidarSDK()
     detector = DroneDetector()
-    visualizer = Visualizer()
+    detector.batch_size = args.batch_size
+    detector.min_track_frames = args.min_track_frames
+    visualizer = None if args.no_viz else Visualizer()
+    
+    # 检测线程与主线程（可视化）之间的结果队列，只保留最新一帧结果
+    det_q = queue.Queue(maxsize=1)
+    stop_event = Event()
+    
+    def detection_loop():
+        """检测线程：等待新帧并检测，与数据获取、可视化并行执行"""
+        while not stop_event.is_set():
+            # 等待并获取新一帧原始点云数据（来不及处理的旧帧被直接覆盖）
+            raw_data = lidar.get_latest_raw_data(block=True, timeout=1.0)
+            if raw_data is None:
+                continue
+            
+            # 检测无人机（累计满一批后才输出结果，显示批内最新一帧）
+            try:
+                results = detector.push_frame(raw_data)
+            except Exception:
+                # 打印一次完整的错误信息后停止检测，由主线程退出程序
+                traceback.print_exc()
+                print("检测出错，停止检测")
+                stop_event.set()
+                break
+            if results is not None:
+                _put_latest(det_q, results[-1])
+    
+    detection_thread = Thread(target=detection_loop, daemon=True)
     
     try:
         # 连接激光雷达并开始获取数据
@@ -327,18 +562,15 @@ def main():
             print("无法开始获取点云数据，程序退出")
             return
             
+        detection_thread.start()
         print("无人机检测系统启动，按Ctrl+C退出...")
         
-        # 主循环
-        while True:
-            # 获取最新原始点云数据
-            raw_data = lidar.get_latest_raw_data()
-            if raw_data is None:
-                time.sleep(0.1)
+        # 主循环：显示检测结果（Open3D可视化需在主线程中运行），检测线程出错停止时退出
+        while not stop_event.is_set():
+            try:
+                drones, processed_pcd = det_q.get(timeout=0.1)
+            except queue.Empty:
                 continue
-                
-            # 检测无人机
-            drones, processed_pcd = detector.detect_drones(raw_data)
             
             # 显示检测结果
             if drones:
@@ -347,16 +579,19 @@ def main():
                 print("未检测到无人机")
                 
             # 更新可视化
-            visualizer.update_visualization(processed_pcd, drones)
-            
-            time.sleep(0.1)  # 控制检测频率
+            if visualizer is not None:
+                visualizer.update_visualization(processed_pcd, drones)
             
     except KeyboardInterrupt:
         print("\n用户中断程序")
     finally:
         # 清理资源
+        stop_event.set()
+        if detection_thread.is_alive():
+            detection_thread.join(timeout=2.0)
         lidar.stop_streaming()
-        visualizer.close()
+        if visualizer is not None:
+            visualizer.close()
         print("程序已退出")
 
 if __name__ == "__main__":
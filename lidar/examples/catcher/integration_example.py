@@ -7,7 +7,7 @@
 
 from lidar_udp_receiver import LidarUDPReceiver, LidarPointCloud
 import time
-from threading import Thread
+from threading import Thread, Event
 
 
 class RealLidarSDK:
@@ -29,6 +29,7 @@ class RealLidarSDK:
         self.port = port
         self.latest_cloud = None
         self.running = False
+        self._new_data = Event()  # 有新数据时置位，供消费者阻塞等待
         
         # 创建 UDP 接收器
         self.udp_receiver = LidarUDPReceiver(ip, port)
@@ -74,18 +75,22 @@ class RealLidarSDK:
         self.udp_receiver.stop_streaming()
         print("已停止获取点云数据")
         
-    def get_latest_raw_data(self):
-        """获取最新的原始点云数据"""
+    def get_latest_raw_data(self, block=False, timeout=None):
+        """获取最新的原始点云数据（block=True时等待新一帧，超时返回None）"""
+        if block:
+            if not self._new_data.wait(timeout):
+                return None
+            self._new_data.clear()
         return self.latest_cloud
         
     def _data_sync_loop(self):
         """数据同步循环，从 UDP 接收器获取数据"""
         while self.running:
-            # 从 UDP 接收器获取最新数据
-            raw_data = self.udp_receiver.get_latest_raw_data()
+            # 等待 UDP 接收器的新数据，超时后重新检查运行状态
+            raw_data = self.udp_receiver.get_latest_raw_data(block=True, timeout=0.5)
             if raw_data is not None:
                 self.latest_cloud = raw_data
-            time.sleep(0.01)  # 100Hz 同步频率
+                self._new_data.set()
 
 
 def modify_drone_detector_example():
@@ -7,16 +7,102 @@ Unitree Lidar UDP Data Receiver
 用途: 替代 drone_detector.py 中的 _generate_simulated_raw_data 函数
 """
 
+import ctypes
+import errno
+import os
+import selectors
 import socket
 import struct
+import sys
 import numpy as np
 import time
 import threading
+from collections import deque
 from typing import Optional, Tuple, List
 
+try:
+    from numba import njit
+except ImportError:  # 未安装 numba 时使用 NumPy 切片实现
+    njit = None
+
+
+# Linux recvmmsg(2) 所需的 C 结构体（一次系统调用读取多个 UDP 数据报）
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p),
+                ("iov_len", ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p),
+                ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.POINTER(_IOVec)),
+                ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p),
+                ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr),
+                ("msg_len", ctypes.c_uint)]
+
+
+def _load_recvmmsg():
+    """加载 libc 中的 recvmmsg，非 Linux 或不可用时返回 None"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL("libc.so.6", use_errno=True)
+        func = libc.recvmmsg
+    except (OSError, AttributeError):
+        return None
+    func.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint,
+                     ctypes.c_int, ctypes.c_void_p]
+    func.restype = ctypes.c_int
+    return func
+
+
+_recvmmsg = _load_recvmmsg()
+_MSG_DONTWAIT = getattr(socket, "MSG_DONTWAIT", 0x40)
+
+
+def _split_points_numpy(f32, u32, xyz, intensity, times, rings):
+    """
+    将打包的点数据（每点 6 个 4 字节字段）拆分到各输出数组
+
+    Args:
+        f32: 点数据的 float32 视图，长度 6N
+        u32: 点数据的 uint32 视图，长度 6N（用于读取 ring 字段）
+        xyz: 输出坐标 (N, 3) float32
+        intensity: 输出强度 (N,) float32
+        times: 输出时间 (N,) float32
+        rings: 输出线号 (N,) uint32
+    """
+    fields = f32.reshape(-1, 6)
+    xyz[:] = fields[:, :3]
+    intensity[:] = fields[:, 3]
+    times[:] = fields[:, 4]
+    rings[:] = u32.reshape(-1, 6)[:, 5]
+
+
+if njit is not None:
+    @njit(cache=True, nogil=True)
+    def _split_points(f32, u32, xyz, intensity, times, rings):
+        """编译版逐点拆分（一次遍历完成，执行期间释放 GIL），参数同 _split_points_numpy"""
+        for i in range(xyz.shape[0]):
+            base = i * 6
+            xyz[i, 0] = f32[base]
+            xyz[i, 1] = f32[base + 1]
+            xyz[i, 2] = f32[base + 2]
+            intensity[i] = f32[base + 3]
+            times[i] = f32[base + 4]
+            rings[i] = u32[base + 5]
+else:
+    _split_points = _split_points_numpy
+
 
 class PointUnitree:
-    """Unitree 激光雷达点数据结构"""
+    """Unitree 激光雷达点数据结构（仅在调用 get_latest_scan() 时按需构建）"""
     def __init__(self, x: float, y: float, z: float, intensity: float, time: float, ring: int):
         self.x = x
         self.y = y
@@ -27,7 +113,7 @@ class PointUnitree:
 
 
 class ScanUnitree:
-    """Unitree 激光雷达扫描数据结构"""
+    """Unitree 激光雷达扫描数据结构（仅在调用 get_latest_scan() 时按需构建）"""
     def __init__(self, stamp: float, id: int, validPointsNum: int, points: List[PointUnitree]):
         self.stamp = stamp
         self.id = id
@@ -52,6 +138,7 @@ class LidarPointCloud:
         self.points = None  # 三维坐标 (N, 3) 数组 [x, y, z]
         self.intensities = None  # 反射强度 (N,) 数组
         self.timestamp = None  # 时间戳
+        self._scan_slot = None  # 接收器内部：数组所属的暂存槽位，供 recycle() 交还复用
 
 
 class LidarUDPReceiver:
@@ -77,23 +164,88 @@ class LidarUDPReceiver:
         self.socket = None
         self.running = False
         self.thread = None
+        self._sel = None  # 监听套接字与唤醒管道的 selector
+        self._wake_r = None
+        self._wake_w = None
 
-        # 数据存储
-        self.latest_scan = None
+        # 数据存储（扫描数据以各字段数组保存，不在接收线程中构建逐点对象）
+        # 单生产者、只读消费者：以一次属性赋值整体发布，读取方无需加锁
+        self._latest_scan = None  # ((stamp, id, valid_points_num), (times, rings), point_cloud)
         self.latest_imu = None
-        self.latest_point_cloud = None
-        self.data_lock = threading.Lock()
+        # 最近若干帧点云的有界队列，供 get_batch() 逐帧处理；满时自动丢弃最旧的帧
+        # （队列中的每帧都持有独立的数组，取出后可以长期保留，处理完可用 recycle() 交还）
+        self.scan_queue_size = 8
+        self._scan_queue = deque(maxlen=self.scan_queue_size)
+        # 可复用的点云暂存槽位 [字段数组组, 点数, 按点数切好的视图]：只复用调用方通过 recycle()
+        # 交还的帧，已发布且未交还的点云不会被接收线程改写（没有可复用的槽位时每帧新分配）
+        # 点数与槽位上次相同时直接复用切好的视图
+        self._scan_pool = deque(maxlen=self.scan_queue_size)
+
+        self._new_data = threading.Event()  # 收到新点云时置位
+
+        # 套接字接收配置：复用同一块接收缓冲区，避免每个数据包分配新对象
+        self.rcvbuf_size = 12 * 1024 * 1024
+        self._rx_buf = bytearray(65536)
+        self._rx_view = memoryview(self._rx_buf)
+        self.recv_batch = 64  # recvmmsg 单次最多读取的数据报数量
 
         # 数据结构大小计算
         self.imu_data_str = "=dI4f3f3f"
         self.imu_data_size = struct.calcsize(self.imu_data_str)
         self.point_data_str = "=fffffI"
         self.point_size = struct.calcsize(self.point_data_str)
+        # 预编译的解包函数，按偏移直接读取，避免每包解析格式串和切片
+        self._u32 = struct.Struct("=I").unpack_from
+        self._scan_header = struct.Struct("=IdII")  # length, stamp, id, valid_points_num
+        self._imu_u = struct.Struct(self.imu_data_str).unpack_from
+
+        # 消息类型 -> 解析函数
+        self._dispatch = {
+            101: self._parse_imu_message,   # IMU 消息
+            102: self._parse_scan_message,  # 点云扫描消息
+        }
+        self._unknown_types = set()  # 已提示过的未知消息类型，避免逐包打印
+        # 点数据按每点 6 个 4 字节字段（x, y, z, intensity, time, ring）紧凑排列
+        assert self.point_size == 6 * 4
 
         print(f"LidarUDPReceiver 初始化完成")
         print(f"监听地址: {self.udp_ip}:{self.udp_port}")
         print(f"数据结构大小: point={self.point_size}, imu={self.imu_data_size}")
 
+    def _take_scan_slot(self, n: int) -> list:
+        """
+        取一个可容纳 n 个点的暂存槽位：优先复用 recycle() 交还的槽位，否则新分配
+
+        Returns:
+            list: [字段数组组, n, (xyz, intensity, times, rings) 长度为 n 的视图]
+        """
+        try:
+            slot = self._scan_pool.pop()
+        except IndexError:
+            slot = None
+        if slot is None or len(slot[0][1]) < n:
+            slot = [self._alloc_scan_buffers(n), None, None]
+        if slot[1] != n:
+            slot[1] = n
+            slot[2] = tuple(buf[:n] for buf in slot[0])
+        return slot
+
+    @staticmethod
+    def _alloc_scan_buffers(capacity: int) -> Tuple[np.ndarray, ...]:
+        """
+        分配一组点云字段数组
+
+        Args:
+            capacity: 点数
+
+        Returns:
+            tuple: (xyz, intensity, times, rings)
+        """
+        return (np.empty((capacity, 3), dtype=np.float32),
+                np.empty(capacity, dtype=np.float32),
+                np.empty(capacity, dtype=np.float32),
+                np.empty(capacity, dtype=np.uint32))
+
     def connect(self) -> bool:
         """
         连接到 UDP 端口
@@ -103,8 +255,16 @@ class LidarUDPReceiver:
         """
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            # 增大内核接收缓冲区，避免突发数据时丢包（实际大小受 net.core.rmem_max 限制）
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf_size)
             self.socket.bind((self.udp_ip, self.udp_port))
-            self.socket.settimeout(1.0)  # 设置超时，便于优雅退出
+            # 非阻塞套接字 + selector 等待可读，停止时通过管道唤醒，无需超时轮询
+            self.socket.setblocking(False)
+            self._wake_r, self._wake_w = os.pipe()
+            self._sel = selectors.DefaultSelector()
+            self._sel.register(self.socket, selectors.EVENT_READ)
+            self._sel.register(self._wake_r, selectors.EVENT_READ)
             print(f"UDP 套接字绑定成功: {self.udp_ip}:{self.udp_port}")
             return True
         except Exception as e:
@@ -132,63 +292,198 @@ class LidarUDPReceiver:
     def stop_streaming(self):
         """停止接收数据流"""
         self.running = False
+        if self._wake_w is not None:
+            os.write(self._wake_w, b"\0")  # 唤醒阻塞在 select 上的接收线程
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=2.0)
+        if self._sel is not None:
+            self._sel.close()
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+            self._sel = self._wake_r = self._wake_w = None
         if self.socket:
             self.socket.close()
         print("已停止接收激光雷达数据")
 
-    def get_latest_raw_data(self) -> Optional[LidarPointCloud]:
+    def get_latest_raw_data(self, block: bool = False,
+                            timeout: Optional[float] = None) -> Optional[LidarPointCloud]:
         """
         获取最新的原始点云数据（与 drone_detector.py 兼容的接口）
 
+        Args:
+            block: 是否等待下一帧新数据
+            timeout: 等待超时时间（秒），None 表示一直等待
+
         Returns:
-            LidarPointCloud: 最新的点云数据，如果没有数据则返回 None
+            LidarPointCloud: 最新的点云数据，如果没有数据（或等待超时）则返回 None
+        """
+        if block:
+            if not self._new_data.wait(timeout):
+                return None
+            self._new_data.clear()
+        latest = self._latest_scan
+        return latest[2] if latest is not None else None
+
+    def get_batch(self, block: bool = False,
+                  timeout: Optional[float] = None) -> List[LidarPointCloud]:
+        """
+        取出队列中尚未处理的全部点云（按到达顺序）
+
+        Args:
+            block: 队列为空时是否等待新数据
+            timeout: 等待超时时间（秒），None 表示一直等待
+
+        Returns:
+            List[LidarPointCloud]: 最多 scan_queue_size 帧点云，没有数据时为空列表；
+            各帧数组归调用方所有，在调用方 recycle() 交还之前不会被之后到达的扫描覆盖
+        """
+        if block and not self._scan_queue:
+            self._new_data.clear()
+            if not self._scan_queue:
+                self._new_data.wait(timeout)
+
+        batch = []
+        while True:
+            try:
+                batch.append(self._scan_queue.popleft())
+            except IndexError:
+                break
+        return batch
+
+    def recycle(self, point_cloud: LidarPointCloud):
+        """
+        交还处理完的点云，其数组可被之后到达的扫描复用
+
+        调用后不得再访问该点云的数组（points、intensities 会被置为 None）。
+        仍作为最新一帧发布或仍在队列中的点云不会被复用，此时调用不产生任何效果。
+        只适用于单个消费者：交还前须确认没有其他线程仍在使用该点云。
+
+        Args:
+            point_cloud: get_latest_raw_data() 或 get_batch() 返回的点云
         """
-        with self.data_lock:
-            return self.latest_point_cloud
+        slot = point_cloud._scan_slot
+        if slot is None:
+            return
+        # 已被新帧取代、已离开队列的点云不会再次发布，交还后只有接收线程会访问其数组
+        latest = self._latest_scan
+        if latest is not None and latest[2] is point_cloud:
+            return
+        if any(cloud is point_cloud for cloud in list(self._scan_queue)):
+            return
+        point_cloud._scan_slot = None
+        point_cloud.points = point_cloud.intensities = None
+        self._scan_pool.append(slot)
 
     def get_latest_scan(self) -> Optional[ScanUnitree]:
-        """获取最新的扫描数据"""
-        with self.data_lock:
-            return self.latest_scan
+        """获取最新的扫描数据（按需由各字段数组构建逐点对象）"""
+        latest = self._latest_scan
+        if latest is None:
+            return None
+        header, (times, rings), cloud = latest
+        stamp, id, valid_points_num = header
+        xyz = cloud.points.tolist()
+        points = [PointUnitree(x, y, z, intensity, t, ring)
+                  for (x, y, z), intensity, t, ring
+                  in zip(xyz, cloud.intensities.tolist(), times.tolist(), rings.tolist())]
+        return ScanUnitree(stamp, id, valid_points_num, points)
 
     def get_latest_imu(self) -> Optional[IMUUnitree]:
         """获取最新的 IMU 数据"""
-        with self.data_lock:
-            return self.latest_imu
+        return self.latest_imu
 
     def _data_receiving_loop(self):
-        """数据接收循环"""
+        """数据接收循环（Linux 下使用 recvmmsg 批量接收）"""
+        if _recvmmsg is not None:
+            self._recvmmsg_loop()
+            return
+
         while self.running:
             try:
-                # 接收 UDP 数据
-                data, addr = self.socket.recvfrom(10000)
-                # print(f"收到数据来自 {addr[0]}:{addr[1]}")
-
-                # 解析消息类型
-                msg_type = struct.unpack("=I", data[:4])[0]
-
-                if msg_type == 101:  # IMU 消息
-                    self._parse_imu_message(data)
-                elif msg_type == 102:  # 点云扫描消息
-                    self._parse_scan_message(data)
-                else:
-                    print(f"未知消息类型: {msg_type}")
-
-            except socket.timeout:
-                # 超时是正常的，继续循环
-                continue
+                if not self._wait_readable():
+                    continue
+
+                # 取空已到达的数据报，接收到复用缓冲区
+                while True:
+                    try:
+                        nbytes, addr = self.socket.recvfrom_into(self._rx_buf)
+                    except BlockingIOError:
+                        break
+                    # print(f"收到数据来自 {addr[0]}:{addr[1]}")
+                    self._dispatch_message(self._rx_view[:nbytes])
+
             except Exception as e:
                 if self.running:  # 只有在运行时才报告错误
                     print(f"数据接收错误: {e}")
                 break
 
-    def _parse_imu_message(self, data: bytes):
+    def _recvmmsg_loop(self):
+        """基于 recvmmsg 的接收循环：一次系统调用取回最多 recv_batch 个数据报"""
+        slot = len(self._rx_buf)
+        batch = self.recv_batch
+        slab = bytearray(batch * slot)
+        slab_view = memoryview(slab)
+        base = ctypes.addressof((ctypes.c_char * len(slab)).from_buffer(slab))
+
+        iovecs = (_IOVec * batch)()
+        msgs = (_MMsgHdr * batch)()
+        for i in range(batch):
+            iovecs[i].iov_base = base + i * slot
+            iovecs[i].iov_len = slot
+            msgs[i].msg_hdr.msg_iov = ctypes.pointer(iovecs[i])
+            msgs[i].msg_hdr.msg_iovlen = 1
+
+        fd = self.socket.fileno()
+        while self.running:
+            try:
+                if not self._wait_readable():
+                    continue
+
+                # 批量取空已到达的数据报
+                n = batch
+                while n == batch:
+                    n = _recvmmsg(fd, msgs, batch, _MSG_DONTWAIT, None)
+                    if n < 0:
+                        err = ctypes.get_errno()
+                        if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                            break
+                        raise OSError(err, os.strerror(err))
+
+                    for i in range(n):
+                        offset = i * slot
+                        self._dispatch_message(slab_view[offset:offset + msgs[i].msg_len])
+
+            except Exception as e:
+                if self.running:  # 只有在运行时才报告错误
+                    print(f"数据接收错误: {e}")
+                break
+
+    def _wait_readable(self) -> bool:
+        """
+        阻塞等待套接字可读
+
+        Returns:
+            bool: 套接字可读返回 True，被 stop_streaming 唤醒时返回 False
+        """
+        for key, _ in self._sel.select():
+            if key.fileobj is self.socket:
+                return True
+        return False
+
+    def _dispatch_message(self, data: memoryview):
+        """按消息类型分发到对应的解析函数"""
+        msg_type = self._u32(data, 0)[0]
+        handler = self._dispatch.get(msg_type)
+        if handler is not None:
+            handler(data)
+        elif msg_type not in self._unknown_types:
+            self._unknown_types.add(msg_type)
+            print(f"未知消息类型: {msg_type}")
+
+    def _parse_imu_message(self, data: memoryview):
         """解析 IMU 消息"""
         try:
-            length = struct.unpack("=I", data[4:8])[0]
-            imu_data = struct.unpack(self.imu_data_str, data[8:8+self.imu_data_size])
+            length = self._u32(data, 4)[0]
+            imu_data = self._imu_u(data, 8)
 
             imu_msg = IMUUnitree(
                 stamp=imu_data[0],
@@ -198,75 +493,40 @@ class LidarUDPReceiver:
                 linear_acceleration=imu_data[9:12]
             )
 
-            with self.data_lock:
-                self.latest_imu = imu_msg
+            self.latest_imu = imu_msg
 
         except Exception as e:
             print(f"IMU 消息解析错误: {e}")
 
-    def _parse_scan_message(self, data: bytes):
+    def _parse_scan_message(self, data: memoryview):
         """解析点云扫描消息"""
         try:
-            length = struct.unpack("=I", data[4:8])[0]
-            stamp = struct.unpack("=d", data[8:16])[0]
-            id = struct.unpack("=I", data[16:20])[0]
-            valid_points_num = struct.unpack("=I", data[20:24])[0]
-
-            # 解析点云数据
-            scan_points = []
-            point_start_addr = 24
-
-            for i in range(valid_points_num):
-                point_data = struct.unpack(
-                    self.point_data_str,
-                    data[point_start_addr:point_start_addr + self.point_size]
-                )
-                point_start_addr += self.point_size
-                point = PointUnitree(*point_data)
-                scan_points.append(point)
-
-            scan_msg = ScanUnitree(stamp, id, valid_points_num, scan_points)
-
-            # 转换为 LidarPointCloud 格式
-            point_cloud = self._convert_to_point_cloud(scan_msg)
-
-            with self.data_lock:
-                self.latest_scan = scan_msg
-                self.latest_point_cloud = point_cloud
+            length, stamp, id, valid_points_num = self._scan_header.unpack_from(data, 4)
+
+            # 以零拷贝视图读取接收缓冲区中的点数据，一次遍历拆分到连续的各字段数组
+            # （接收缓冲区会被下一个数据包覆盖，拆分即完成唯一一次拷贝）
+            # 目标数组只取自调用方交还的帧或新分配：发布出去的点云在交还前不会被接收线程改写
+            n = valid_points_num
+            f32 = np.frombuffer(data, dtype=np.float32, count=n * 6, offset=24)
+            u32 = np.frombuffer(data, dtype=np.uint32, count=n * 6, offset=24)
+            slot = self._take_scan_slot(n)
+            xyz, intensity, times, rings = slot[2]
+            _split_points(f32, u32, xyz, intensity, times, rings)
+
+            point_cloud = LidarPointCloud()
+            point_cloud.timestamp = stamp
+            point_cloud.points = xyz
+            point_cloud.intensities = intensity
+            point_cloud._scan_slot = slot
+
+            # 一次赋值同时发布头信息、逐点附加字段和点云，保证三者一致
+            self._latest_scan = ((stamp, id, valid_points_num), (times, rings), point_cloud)
+            self._scan_queue.append(point_cloud)
+            self._new_data.set()
 
         except Exception as e:
             print(f"扫描消息解析错误: {e}")
 
-    def _convert_to_point_cloud(self, scan_msg: ScanUnitree) -> LidarPointCloud:
-        """
-        将 ScanUnitree 转换为 LidarPointCloud 格式
-
-        Args:
-            scan_msg: 扫描消息
-
-        Returns:
-            LidarPointCloud: 转换后的点云数据
-        """
-        cloud = LidarPointCloud()
-        cloud.timestamp = scan_msg.stamp
-
-        if scan_msg.validPointsNum > 0:
-            # 提取坐标和强度
-            points = []
-            intensities = []
-
-            for point in scan_msg.points:
-                points.append([point.x, point.y, point.z])
-                intensities.append(point.intensity)
-
-            cloud.points = np.array(points, dtype=np.float32)
-            cloud.intensities = np.array(intensities, dtype=np.float32)
-        else:
-            cloud.points = np.empty((0, 3), dtype=np.float32)
-            cloud.intensities = np.empty(0, dtype=np.float32)
-
-        return cloud
-
 
 def create_lidar_receiver(udp_ip: str = "0.0.0.0", udp_port: int = 12345) -> LidarUDPReceiver:
     """
@@ -7,9 +7,57 @@
 import numpy as np
 import time
 import math
+import sys
+import queue
+import threading
+from collections import deque
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
 from lidar_udp_receiver import LidarUDPReceiver
 from config import DetectionConfig
 
+try:
+    from numba import njit
+except ImportError:  # 未安装numba时使用SciPy连通分量实现
+    njit = None
+
+def _label_components_scipy(indptr, indices):
+    """求 CSR 邻接表（点 i 的邻居为 indices[indptr[i]:indptr[i + 1]]）的连通分量，返回每个点的标签"""
+    n = indptr.shape[0] - 1
+    graph = csr_matrix((np.ones(len(indices), dtype=np.int8), indices, indptr), shape=(n, n))
+    return connected_components(graph, directed=False)[1].astype(np.int32)
+
+if njit is not None:
+    @njit(cache=True)
+    def _label_components(indptr, indices):
+        """编译版对 CSR 邻接表做广度优先搜索，参数同 _label_components_scipy"""
+        n = indptr.shape[0] - 1
+        labels = np.full(n, -1, dtype=np.int32)
+        # 预分配BFS待访问数组，每个点在入队时即被标记，最多入队一次
+        frontier = np.empty(n, dtype=np.int32)
+        num_labels = 0
+        for i in range(n):
+            if labels[i] != -1:
+                continue
+            labels[i] = num_labels
+            frontier[0] = i
+            head = 0
+            tail = 1
+            while head < tail:
+                current_idx = frontier[head]
+                head += 1
+                for k in range(indptr[current_idx], indptr[current_idx + 1]):
+                    j = indices[k]
+                    if labels[j] == -1:
+                        labels[j] = num_labels
+                        frontier[tail] = j
+                        tail += 1
+            num_labels += 1
+        return labels
+else:
+    _label_components = _label_components_scipy
+
 class SimpleDroneDetector:
     def __init__(self):
         self.min_cluster_size = 5  # 最小聚类点数
@@ -17,6 +65,7 @@ class SimpleDroneDetector:
         self.cluster_distance = 0.5  # 聚类距离阈值
         self.min_height = 0.5  # 最小高度
         self.max_height = 10.0  # 最大高度
+        self.brute_force_max_points = 64  # 点数不超过此值时直接暴力计算距离，不构建 KD 树
 
     def detect_objects(self, points):
         """
@@ -25,23 +74,22 @@ class SimpleDroneDetector:
         if points is None or len(points) == 0:
             return []
 
-        # 过滤高度范围
-        valid_points = []
-        for point in points:
-            if self.min_height <= point[2] <= self.max_height:
-                valid_points.append(point)
+        # 过滤高度范围（整列向量化比较）
+        points = np.asarray(points, dtype=np.float32)
+        mask = (points[:, 2] >= self.min_height) & (points[:, 2] <= self.max_height)
+        valid_points = points[mask]
 
         if len(valid_points) < self.min_cluster_size:
             return []
 
-        # 简单聚类算法
+        # 简单聚类算法（返回每个聚类的点索引）
         clusters = self.simple_clustering(valid_points)
 
         # 分析聚类特征
         detected_objects = []
-        for cluster in clusters:
-            if self.min_cluster_size <= len(cluster) <= self.max_cluster_size:
-                obj_info = self.analyze_cluster(cluster)
+        for cluster_idx in clusters:
+            if self.min_cluster_size <= len(cluster_idx) <= self.max_cluster_size:
+                obj_info = self.analyze_cluster(valid_points[cluster_idx])
                 if obj_info:
                     detected_objects.append(obj_info)
 
@@ -49,44 +97,66 @@ class SimpleDroneDetector:
 
     def simple_clustering(self, points):
         """
-        简单的基于距离的聚类
+        基于距离的聚类（KD 树邻域查询 + 广度优先搜索连通分量）
+
+        Returns:
+            list: 每个聚类的点索引数组
         """
         if len(points) == 0:
             return []
 
-        clusters = []
-        used = set()
+        points = np.asarray(points, dtype=np.float32)
+        radius = DetectionConfig.CLUSTERING_DISTANCE  # 聚类距离阈值（两种路径共用）
+        if len(points) <= self.brute_force_max_points:
+            return self._bfs_clustering(points, radius)
 
-        for i, point in enumerate(points):
-            if i in used:
-                continue
+        # 一次性查询所有点的邻域
+        tree = cKDTree(points)
+        neighbors = tree.query_ball_point(points, r=radius, workers=-1)
 
-            cluster = [point]
-            used.add(i)
+        # 邻域列表转换为 CSR 格式（indptr, indices），交给编译后的 BFS 标记连通分量
+        indptr = np.zeros(len(points) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, neighbors), dtype=np.int64, count=len(points)),
+                  out=indptr[1:])
+        indices = np.concatenate(neighbors).astype(np.int32)
+        labels = _label_components(indptr, indices)
 
-            # 递归查找邻近点
-            queue = [i]
-            while queue:
-                current_idx = queue.pop(0)
-                current_point = points[current_idx]
+        # 按标签分组得到每个聚类的点索引
+        order = np.argsort(labels, kind='stable')
+        boundaries = np.searchsorted(labels[order], np.arange(1, labels.max() + 1))
+        return np.split(order, boundaries)
 
-                for j, other_point in enumerate(points):
-                    if j in used:
-                        continue
-
-                    if self.calculate_distance(current_point, other_point) < DetectionConfig.CLUSTERING_DISTANCE:
-                        cluster.append(other_point)
-                        used.add(j)
-                        queue.append(j)
+    def _bfs_clustering(self, points, radius):
+        """
+        小点集的聚类：广度优先搜索，每次用 NumPy 计算当前点到全部点的距离平方
 
-            clusters.append(cluster)
+        Args:
+            points: 点坐标 [N, 3]
+            radius: 聚类距离阈值
 
+        Returns:
+            list: 每个聚类的点索引数组
+        """
+        r2 = radius * radius  # 比较距离平方，无需开方
+        used = np.zeros(len(points), dtype=bool)
+        clusters = []
+        for i in range(len(points)):
+            if used[i]:
+                continue
+            used[i] = True
+            members = [i]
+            frontier = deque([i])
+            while frontier:
+                current_idx = frontier.popleft()
+                d2 = np.sum((points - points[current_idx]) ** 2, axis=1)
+                # 与 KD 树查询一致，距离等于阈值也算邻居
+                cand = np.flatnonzero((d2 <= r2) & ~used)
+                used[cand] = True
+                members.extend(cand.tolist())
+                frontier.extend(cand.tolist())
+            clusters.append(np.sort(np.asarray(members, dtype=np.intp)))
         return clusters
 
-    def calculate_distance(self, p1, p2):
-        """计算两点间距离"""
-        return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2 + (p1[2] - p2[2])**2)
-
     def analyze_cluster(self, cluster):
         """
         分析聚类特征
@@ -94,25 +164,13 @@ class SimpleDroneDetector:
         if len(cluster) < DetectionConfig.MIN_POINTS_PER_CLUSTER:
             return None
 
-        # 计算聚类中心
-        center_x = sum(p[0] for p in cluster) / len(cluster)
-        center_y = sum(p[1] for p in cluster) / len(cluster)
-        center_z = sum(p[2] for p in cluster) / len(cluster)
-
-        # 计算聚类尺寸
-        min_x = min(p[0] for p in cluster)
-        max_x = max(p[0] for p in cluster)
-        min_y = min(p[1] for p in cluster)
-        max_y = max(p[1] for p in cluster)
-        min_z = min(p[2] for p in cluster)
-        max_z = max(p[2] for p in cluster)
-
-        size_x = max_x - min_x
-        size_y = max_y - min_y
-        size_z = max_z - min_z
+        # 计算聚类中心和尺寸（向量化归约）
+        cluster = np.asarray(cluster, dtype=np.float32)
+        center_x, center_y, center_z = (float(v) for v in cluster.mean(axis=0))
+        size_x, size_y, size_z = (float(v) for v in cluster.max(axis=0) - cluster.min(axis=0))
 
         # 计算距离
-        distance = math.sqrt(center_x**2 + center_y**2)
+        distance = math.hypot(center_x, center_y)
 
         # 使用配置文件中的无人机判断逻辑
         is_drone_like = (
@@ -143,6 +201,37 @@ class SimpleDroneDetector:
 
         return (point_confidence + size_confidence) / 2.0
 
+def format_targets(timestamp, targets):
+    """将检测结果格式化为一段输出文本"""
+    lines = [f"\n时间: {timestamp:.3f}", f"检测到 {len(targets)} 个目标:"]
+    for i, obj in enumerate(targets):
+        center = obj['center']
+        size = obj['size']
+        status = "可能是无人机" if obj['is_drone_like'] else "其他目标"
+        lines.append(f"  目标 {i+1}: {status}")
+        lines.append(f"    位置: ({center[0]:.2f}, {center[1]:.2f}, {center[2]:.2f})")
+        lines.append(f"    尺寸: {size[0]:.2f}×{size[1]:.2f}×{size[2]:.2f}m")
+        lines.append(f"    距离: {obj['distance']:.2f}m")
+        lines.append(f"    置信度: {obj['confidence']:.2f}")
+        lines.append(f"    点数: {obj['point_count']}")
+    return "\n".join(lines) + "\n"
+
+def printer_loop(output_queue):
+    """后台输出线程：检测循环不会因终端输出缓慢而阻塞"""
+    while True:
+        text = output_queue.get()
+        if text is None:
+            break
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+def emit(output_queue, text):
+    """提交输出文本，队列已满时直接丢弃"""
+    try:
+        output_queue.put_nowait(text)
+    except queue.Full:
+        pass
+
 def main():
     print("启动简化版无人机检测器...")
     print("连接到雷达数据流...")
@@ -162,6 +251,11 @@ def main():
 
     print("开始检测，按 Ctrl+C 退出...")
 
+    # 检测结果交给后台线程输出
+    output_queue = queue.Queue(maxsize=16)
+    printer = threading.Thread(target=printer_loop, args=(output_queue,), daemon=True)
+    printer.start()
+
     try:
         while True:
             # 获取最新点云数据
@@ -188,27 +282,14 @@ def main():
                         if show_target:
                             filtered_targets.append(obj)
 
-                # 输出结果
+                # 输出结果（仅在需要输出时格式化，写终端由后台线程完成）
                 if filtered_targets:
-                    print(f"\n时间: {point_cloud.timestamp:.3f}")
-                    print(f"检测到 {len(filtered_targets)} 个目标:")
-
-                    for i, obj in enumerate(filtered_targets):
-                        center = obj['center']
-                        size = obj['size']
-                        distance = obj['distance']
-                        confidence = obj['confidence']
-                        is_drone = obj['is_drone_like']
-
-                        status = "可能是无人机" if is_drone else "其他目标"
-                        print(f"  目标 {i+1}: {status}")
-                        print(f"    位置: ({center[0]:.2f}, {center[1]:.2f}, {center[2]:.2f})")
-                        print(f"    尺寸: {size[0]:.2f}×{size[1]:.2f}×{size[2]:.2f}m")
-                        print(f"    距离: {distance:.2f}m")
-                        print(f"    置信度: {confidence:.2f}")
-                        print(f"    点数: {obj['point_count']}")
+                    emit(output_queue, format_targets(point_cloud.timestamp, filtered_targets))
                 elif not DetectionConfig.QUIET_MODE:
-                    print(f"时间: {point_cloud.timestamp:.3f} - 未检测到目标")
+                    emit(output_queue, f"时间: {point_cloud.timestamp:.3f} - 未检测到目标\n")
+
+                # 检测结果不引用点云数组，处理完交还给接收器复用
+                receiver.recycle(point_cloud)
 
             time.sleep(DetectionConfig.DETECTION_INTERVAL)  # 检测间隔
 
@@ -218,6 +299,9 @@ def main():
         print(f"错误: {e}")
     finally:
         receiver.stop_streaming()
+        # 等待已排队的输出写完
+        output_queue.put(None)
+        printer.join(timeout=1.0)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -11,6 +11,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 import os
 import argparse
+from lidar_data_recorder import load_points
 
 def load_and_analyze_lidar_data(filepath):
     """
@@ -27,23 +28,26 @@ def load_and_analyze_lidar_data(filepath):
         return
     
     # 加载数据
-    data = np.load(filepath, allow_pickle=True)
+    data = np.load(filepath)
     
     print("\n📊 数据文件内容:")
     for key in data.files:
+        if key == 'recording_info':
+            # 早期文件以pickle字典保存记录信息，不加载
+            print(f"   {key}: (早期格式，未加载)")
+            continue
         print(f"   {key}: {type(data[key])}")
     
     # 提取记录信息
-    if 'recording_info' in data:
-        info = data['recording_info'].item()
+    if 'info_duration' in data:
         print(f"\n🕒 记录信息:")
-        print(f"   记录时长: {info['duration']:.2f}秒")
-        print(f"   扫描帧数: {info['scan_count']}")
-        print(f"   IMU数据: {info['imu_count']}")
+        print(f"   记录时长: {float(data['info_duration']):.2f}秒")
+        print(f"   扫描帧数: {int(data['info_scan_count'])}")
+        print(f"   IMU数据: {int(data['info_imu_count'])}")
     
     # 分析点云数据
-    if 'points' in data:
-        points = data['points']
+    points = load_points(data, filepath)
+    if points is not None:
         print(f"\n☁️  点云数据分析:")
         print(f"   总点数: {len(points):,}")
         print(f"   数据形状: {points.shape}")
@@ -59,8 +63,10 @@ def load_and_analyze_lidar_data(filepath):
         print(f"   时间: [{time.min():.6f}, {time.max():.6f}]")
         print(f"   环数: [{ring.min():.0f}, {ring.max():.0f}]")
         
-        # 距离分析
-        distances = np.sqrt(x**2 + y**2 + z**2)
+        # 距离分析（einsum 直接求平方和，不生成临时数组）
+        xyz = points[:, :3]
+        distances = np.einsum('ij,ij->i', xyz, xyz)
+        np.sqrt(distances, out=distances)
         print(f"   距离: [{distances.min():.3f}, {distances.max():.3f}] 米")
         print(f"   平均距离: {distances.mean():.3f} 米")
         
@@ -80,9 +86,10 @@ def visualize_point_cloud(points, max_points=10000):
         print("❌ 没有点云数据可视化")
         return
     
-    # 如果点太多，随机采样
+    # 如果点太多，随机采样（只采样一次，各子图共用；索引排序后按文件顺序读取内存映射的点云）
+    rng = np.random.default_rng()
     if len(points) > max_points:
-        indices = np.random.choice(len(points), max_points, replace=False)
+        indices = np.sort(rng.choice(len(points), max_points, replace=False, shuffle=False))
         points_vis = points[indices]
         print(f"🎯 随机采样 {max_points:,} 个点进行可视化")
     else:
@@ -137,9 +144,9 @@ def visualize_point_cloud(points, max_points=10000):
     
     # 6. 3D散点图
     ax6 = fig.add_subplot(2, 3, 6, projection='3d')
-    # 进一步采样以提高3D显示性能
+    # 在已采样的点中进一步采样以提高3D显示性能
     if len(points_vis) > 5000:
-        indices_3d = np.random.choice(len(points_vis), 5000, replace=False)
+        indices_3d = rng.choice(len(points_vis), 5000, replace=False, shuffle=False)
         x_3d, y_3d, z_3d, intensity_3d = x[indices_3d], y[indices_3d], z[indices_3d], intensity[indices_3d]
     else:
         x_3d, y_3d, z_3d, intensity_3d = x, y, z, intensity
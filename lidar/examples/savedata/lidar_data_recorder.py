@@ -7,28 +7,28 @@ Unitree激光雷达数据记录器
 日期: 2025年
 """
 
+import ctypes
+import errno
+import io
+import select
 import socket
 import struct
+import sys
 import numpy as np
 import os
 import time
 from datetime import datetime
 import argparse
 
+try:
+    from numba import njit
+except ImportError:  # 未安装numba时使用NumPy切片实现
+    njit = None
+
 # IP and Port
 UDP_IP = "0.0.0.0"
 UDP_PORT = 12345
 
-# Point Type
-class PointUnitree:
-    def __init__(self, x, y, z, intensity, time, ring):
-        self.x = x
-        self.y = y
-        self.z = z
-        self.intensity = intensity
-        self.time = time
-        self.ring = ring
-
 # Scan Type
 class ScanUnitree:
     def __init__(self, stamp, id, validPointsNum, points):
@@ -46,8 +46,130 @@ class IMUUnitree:
         self.angular_velocity = angular_velocity
         self.linear_acceleration = linear_acceleration
 
+# recvmmsg(2) 所需的C结构体（Linux下一次系统调用批量接收多个数据包）
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p),
+                ("iov_len", ctypes.c_size_t)]
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p),
+                ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.POINTER(_IOVec)),
+                ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p),
+                ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr),
+                ("msg_len", ctypes.c_uint)]
+
+def _load_recvmmsg():
+    """加载libc中的recvmmsg，非Linux或不可用时返回None"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        func = ctypes.CDLL("libc.so.6", use_errno=True).recvmmsg
+    except (OSError, AttributeError):
+        return None
+    func.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint,
+                     ctypes.c_int, ctypes.c_void_p]
+    func.restype = ctypes.c_int
+    return func
+
+_recvmmsg = _load_recvmmsg()
+_MSG_DONTWAIT = getattr(socket, "MSG_DONTWAIT", 0x40)
+
+def _unpack_points_numpy(f32, u32, out):
+    """
+    将打包的点数据（每点 x,y,z,intensity,time 五个float32和一个uint32 ring）写入 [N, 6] float32 数组
+    
+    Args:
+        f32: 点数据的float32视图，长度6N
+        u32: 点数据的uint32视图，长度6N（用于读取ring）
+        out: 输出数组 [N, 6]
+    """
+    out[:, :5] = f32.reshape(-1, 6)[:, :5]
+    out[:, 5] = u32.reshape(-1, 6)[:, 5]
+
+if njit is not None:
+    @njit(cache=True, nogil=True)
+    def _unpack_points(f32, u32, out):
+        """编译版逐点解析（一次遍历完成），参数同 _unpack_points_numpy"""
+        for i in range(out.shape[0]):
+            base = i * 6
+            for k in range(5):
+                out[i, k] = f32[base + k]
+            out[i, 5] = u32[base + 5]
+else:
+    _unpack_points = _unpack_points_numpy
+
+def quantize_points(points):
+    """
+    将 [N, 6] float32 点云量化为紧凑格式（points_dtype_version=2）
+    
+    xyz 存为 float16（100米处误差约3厘米），强度和环号存为 uint8，
+    点时间按本次记录的最大值缩放到 uint16。
+    
+    Args:
+        points: 点云数据 [N, 6] - x, y, z, intensity, time, ring
+        
+    Returns:
+        dict: 量化后的各字段，可直接并入保存字典
+    """
+    point_time = points[:, 4]
+    time_scale = max(float(point_time.max(initial=0.0)) / 65535, 1e-6)
+    return {
+        'points_dtype_version': np.int32(2),
+        'points_xyz': points[:, :3].astype(np.float16),
+        'points_intensity': np.clip(np.rint(points[:, 3]), 0, 255).astype(np.uint8),
+        'points_time': np.clip(np.rint(point_time / time_scale), 0, 65535).astype(np.uint16),
+        'points_time_scale': np.float64(time_scale),
+        'points_ring': points[:, 5].astype(np.uint8)
+    }
+
+def load_points(data, filepath):
+    """
+    从NPZ数据中取出点云 [N, 6] float32，按 points_dtype_version 区分存储格式：
+    1 为 float32 点云（伴随NPY文件，或早期直接存于NPZ的 points），2 为量化格式；
+    未记录版本号的早期文件按版本1读取
+    
+    Args:
+        data: np.load 返回的NPZ数据
+        filepath: NPZ文件路径（用于定位伴随的点云NPY文件）
+        
+    Returns:
+        np.ndarray: 点云数据 [N, 6] - x, y, z, intensity, time, ring；没有点云时返回None
+    """
+    version = int(data['points_dtype_version']) if 'points_dtype_version' in data else 1
+    if version == 1:
+        if 'points_file' in data:
+            # 点云单独存放在NPZ旁的NPY文件中，以只读内存映射方式打开（不整体读入内存）
+            points_path = os.path.join(os.path.dirname(filepath), str(data['points_file']))
+            return np.load(points_path, mmap_mode='r')
+        if 'points' in data:
+            return data['points']
+        return None
+    if version != 2:
+        raise ValueError(f"不支持的点云格式版本: {version}")
+    
+    xyz = data['points_xyz']
+    points = np.empty((len(xyz), 6), dtype=np.float32)
+    points[:, :3] = xyz
+    points[:, 3] = data['points_intensity']
+    points[:, 4] = data['points_time'] * data['points_time_scale']
+    points[:, 5] = data['points_ring']
+    return points
+
+def _grow(arr, size):
+    """返回扩容到 size 行的新数组，保留原有内容"""
+    new = np.empty((size,) + arr.shape[1:], dtype=arr.dtype)
+    new[:len(arr)] = arr
+    return new
+
 class LidarDataRecorder:
-    def __init__(self, output_dir="data", max_scans=1000, max_duration=60):
+    def __init__(self, output_dir="data", max_scans=1000, max_duration=60, compress=False,
+                 quantize=False):
         """
         初始化数据记录器
         
@@ -55,32 +177,82 @@ class LidarDataRecorder:
             output_dir: 输出目录
             max_scans: 最大记录扫描数量
             max_duration: 最大记录时长(秒)
+            compress: 是否压缩保存（点云压缩率低且很慢，默认不压缩）
+            quantize: 是否量化保存点云（points_dtype_version=2，约为原大小的40%）
         """
         self.output_dir = output_dir
         self.max_scans = max_scans
         self.max_duration = max_duration
+        self.compress = compress
+        self.quantize = quantize
         
         # 确保输出目录存在
         os.makedirs(output_dir, exist_ok=True)
         
-        # 数据存储列表
-        self.scan_data = []
-        self.imu_data = []
+        # 扫描数据：预分配数组，接收时按索引直接写入
+        self._scan_ts = np.empty(max_scans, dtype=np.float64)
+        self._scan_ids = np.empty(max_scans, dtype='<u4')
+        self._scan_valid = np.empty(max_scans, dtype='<u4')
+        self._scan_sys = np.empty(max_scans, dtype=np.float64)
+        # 点云缓冲区：输出目录中的内存映射暂存文件，点云边接收边落盘，不常驻内存
+        # （首帧扫描到达时创建，按每帧150点预估，不足时自动扩容；保存时转为伴随的点云NPY文件，
+        # 未保存的暂存文件由 close() 删除）
+        self._points_generation = 0
+        self._points_path = None
+        self._points_saved_path = None  # 上次保存的伴随点云文件
+        self._points_buf = None
+        self._points_written = 0
+        
+        # IMU数据：与报文布局一致的结构化数组（按每帧扫描10个IMU预估，不足时自动扩容）
+        self.imu_dtype = np.dtype([('stamp', '<f8'), ('id', '<u4'), ('q', '<f4', 4),
+                                   ('w', '<f4', 3), ('a', '<f4', 3)])
+        self._imu_buf = np.empty(max_scans * 10, dtype=self.imu_dtype)
+        self._imu_sys = np.empty(max_scans * 10, dtype=np.float64)
         
         # 统计信息
         self.scan_count = 0
         self.imu_count = 0
         self.start_time = None
+        # 日志采样掩码（2的幂减1）：每32帧扫描、每128个IMU数据打印一次
+        self._scan_log_mask = 31
+        self._imu_log_mask = 127
         
         # 创建UDP socket
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.bind((UDP_IP, UDP_PORT))
+        # 增大内核接收缓冲区，避免突发数据或GC停顿时丢包（实际大小受 net.core.rmem_max 限制）
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        # 非阻塞模式：select 唤醒后一次取空接收队列
+        self.sock.setblocking(False)
+        # 复用的接收缓冲区，避免每个数据包分配新的 bytes 对象
+        self._rxbuf = bytearray(65536)
+        self._rxview = memoryview(self._rxbuf)
+        
+        # Linux下使用recvmmsg批量接收：每个数据包占用接收区中的一个64KB槽位
+        self.recv_batch = 64
+        if _recvmmsg is not None:
+            slot = len(self._rxbuf)
+            self._slab = bytearray(self.recv_batch * slot)
+            self._slab_view = memoryview(self._slab)
+            base = ctypes.addressof((ctypes.c_char * len(self._slab)).from_buffer(self._slab))
+            self._iovecs = (_IOVec * self.recv_batch)()
+            self._msgs = (_MMsgHdr * self.recv_batch)()
+            for i in range(self.recv_batch):
+                self._iovecs[i].iov_base = base + i * slot
+                self._iovecs[i].iov_len = slot
+                self._msgs[i].msg_hdr.msg_iov = ctypes.pointer(self._iovecs[i])
+                self._msgs[i].msg_hdr.msg_iovlen = 1
         
         # 计算结构体大小
         self.imuDataStr = "=dI4f3f3f"
         self.imuDataSize = struct.calcsize(self.imuDataStr)
         self.pointDataStr = "=fffffI"
         self.pointSize = struct.calcsize(self.pointDataStr)
+        # 预编译的解包器，避免每次调用重新解析格式字符串
+        self._u_I = struct.Struct("=I")
+        self._u_hdr = struct.Struct("=IIdII")  # msgType, length, stamp, id, validPointsNum
+        # 点数据按每点6个4字节字段紧凑排列，可直接按float32/uint32视图读取
+        assert self.pointSize == 6 * 4
         self.scanDataStr = "=dII" + 120 * "fffffI"
         self.scanDataSize = struct.calcsize(self.scanDataStr)
         
@@ -91,66 +263,140 @@ class LidarDataRecorder:
         print(f"🎯 监听地址: {UDP_IP}:{UDP_PORT}")
         print("=" * 60)
 
-    def process_scan_message(self, data):
-        """处理扫描消息"""
-        length = struct.unpack("=I", data[4:8])[0]
-        stamp = struct.unpack("=d", data[8:16])[0]
-        id = struct.unpack("=I", data[16:20])[0]
-        validPointsNum = struct.unpack("=I", data[20:24])[0]
+    def _open_points_file(self, rows):
+        """创建新的点云暂存文件并以内存映射方式打开"""
+        self._points_generation += 1
+        self._points_path = os.path.join(
+            self.output_dir, f".points_{os.getpid()}_{self._points_generation}.npy")
+        return np.lib.format.open_memmap(self._points_path, mode='w+',
+                                         dtype=np.float32, shape=(rows, 6))
+
+    def _release_points_file(self):
+        """删除当前点云暂存文件（仍被引用的视图在释放前保持有效）"""
+        if self._points_buf is None:
+            return
+        self._points_buf = None
+        os.remove(self._points_path)
+
+    def _finalize_points_file(self, path):
+        """
+        将点云暂存文件截断到已写入行数，改写NPY头并移动到 path
         
-        # 解析点云数据
-        points = []
-        pointStartAddr = 24
-        for i in range(validPointsNum):
-            pointData = struct.unpack(self.pointDataStr, data[pointStartAddr: pointStartAddr+self.pointSize])
-            pointStartAddr = pointStartAddr + self.pointSize
-            point = PointUnitree(*pointData)
-            points.append([point.x, point.y, point.z, point.intensity, point.time, point.ring])
+        之后若继续接收扫描数据，会由 _create_points_buffer 重新建立暂存文件。
         
-        # 转换为numpy数组
-        points_array = np.array(points, dtype=np.float32)
+        Args:
+            path: 点云NPY文件的目标路径
+        """
+        rows = self._points_written
+        points = self._points_buf
+        self._points_buf = None
+        points.flush()
+        # 按最终行数生成NPY头；numpy为形状预留了增长空间，头长度通常与原来一致，可原地改写
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(
+            header, np.lib.format.header_data_from_array_1_0(points[:rows]))
+        if header.tell() == points.offset:
+            del points
+            with open(self._points_path, 'r+b') as f:
+                f.write(header.getvalue())
+                f.truncate(header.tell() + rows * self.pointSize)
+            os.replace(self._points_path, path)
+        else:
+            # 头长度不一致时退回到拷贝写出
+            np.save(path, points[:rows])
+            del points
+            os.remove(self._points_path)
+        self._points_path = None
+        self._points_saved_path = path
+
+    def _create_points_buffer(self):
+        """建立点云暂存文件（首帧扫描到达时；保存后继续接收时拷回已保存的点云）"""
+        if self._points_saved_path is None:
+            self._points_buf = self._open_points_file(self.max_scans * 150)
+            return
+        saved = np.load(self._points_saved_path, mmap_mode='r')
+        self._points_buf = self._open_points_file(max(2 * len(saved), self.max_scans * 150))
+        self._points_buf[:len(saved)] = saved
+
+    def _grow_points_file(self, rows):
+        """扩容点云暂存文件（拷贝已写入部分到新文件）"""
+        old = self._points_buf
+        old_path = self._points_path
+        new = self._open_points_file(rows)
+        new[:self._points_written] = old[:self._points_written]
+        self._points_buf = new
+        del old
+        os.remove(old_path)
+
+    def close(self):
+        """释放记录器占用的临时文件"""
+        self._release_points_file()
+
+    def __enter__(self):
+        """支持 with 语句，退出时自动调用 close()"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # 异常或中断退出时同样删除点云暂存文件
+        self.close()
+
+    def process_scan_message(self, data):
+        """处理扫描消息，返回本帧点云 [N, 6]（记录缓冲区中的视图）"""
+        _, length, stamp, id, validPointsNum = self._u_hdr.unpack_from(data, 0)
         
-        # 存储扫描数据
-        scan_info = {
-            'timestamp': stamp,
-            'scan_id': id,
-            'valid_points': validPointsNum,
-            'points': points_array,
-            'system_time': time.time()
-        }
+        # 存储扫描数据（直接写入预分配数组）
+        i = self.scan_count
+        if i >= len(self._scan_ts):
+            self._scan_ts, self._scan_ids, self._scan_valid, self._scan_sys = (
+                _grow(arr, 2 * len(arr))
+                for arr in (self._scan_ts, self._scan_ids, self._scan_valid, self._scan_sys))
+        self._scan_ts[i] = stamp
+        self._scan_ids[i] = id
+        self._scan_valid[i] = validPointsNum
+        self._scan_sys[i] = time.time()
         
-        self.scan_data.append(scan_info)
+        # 点云按 [N, 6] float32 写入缓冲区
+        if self._points_buf is None:
+            self._create_points_buffer()
+        start = self._points_written
+        end = start + validPointsNum
+        if end > len(self._points_buf):
+            size = max(end, 2 * len(self._points_buf))
+            self._grow_points_file(size)
+        points_array = self._points_buf[start:end]
+        # 解析点云数据：以零拷贝视图读取，一次遍历写入缓冲区
+        count = validPointsNum * 6
+        _unpack_points(np.frombuffer(data, dtype=np.float32, count=count, offset=24),
+                       np.frombuffer(data, dtype=np.uint32, count=count, offset=24),
+                       points_array)
+        self._points_written = end
         self.scan_count += 1
         
-        print(f"📊 扫描 #{self.scan_count}: ID={id}, 点数={validPointsNum}, 时间戳={stamp:.6f}")
+        if (i & self._scan_log_mask) == 0:
+            print(f"📊 扫描 #{self.scan_count}: ID={id}, 点数={validPointsNum}, 时间戳={stamp:.6f}")
         
-        return scan_info
+        return points_array
 
     def process_imu_message(self, data):
-        """处理IMU消息"""
-        length = struct.unpack("=I", data[4:8])[0]
-        imuData = struct.unpack(self.imuDataStr, data[8:8+self.imuDataSize])
-        
-        # 存储IMU数据
-        imu_info = {
-            'timestamp': imuData[0],
-            'imu_id': imuData[1],
-            'quaternion': np.array(imuData[2:6], dtype=np.float32),
-            'angular_velocity': np.array(imuData[6:9], dtype=np.float32),
-            'linear_acceleration': np.array(imuData[9:12], dtype=np.float32),
-            'system_time': time.time()
-        }
-        
-        self.imu_data.append(imu_info)
+        """处理IMU消息，返回本条IMU记录（记录缓冲区中的视图）"""
+        # 存储IMU数据（整条记录直接写入预分配数组）
+        i = self.imu_count
+        if i >= len(self._imu_buf):
+            self._imu_buf = _grow(self._imu_buf, 2 * len(self._imu_buf))
+            self._imu_sys = _grow(self._imu_sys, 2 * len(self._imu_sys))
+        imu_info = self._imu_buf[i]
+        self._imu_buf[i] = np.frombuffer(data, dtype=self.imu_dtype, count=1, offset=8)[0]
+        self._imu_sys[i] = time.time()
         self.imu_count += 1
         
-        print(f"🧭 IMU #{self.imu_count}: ID={imu_info['imu_id']}, 时间戳={imu_info['timestamp']:.6f}")
+        if (i & self._imu_log_mask) == 0:
+            print(f"🧭 IMU #{self.imu_count}: ID={imu_info['id']}, 时间戳={imu_info['stamp']:.6f}")
         
         return imu_info
 
     def save_data(self, filename_prefix=None):
         """保存数据到NPZ文件"""
-        if not self.scan_data and not self.imu_data:
+        if self.scan_count == 0 and self.imu_count == 0:
             print("⚠️  没有数据可保存")
             return None
             
@@ -160,73 +406,91 @@ class LidarDataRecorder:
             filename_prefix = f"lidar_data_{timestamp}"
         
         filepath = os.path.join(self.output_dir, f"{filename_prefix}.npz")
+        points_name = f"{filename_prefix}_points.npy"
         
-        # 准备保存的数据
+        # 准备保存的数据（记录信息逐项存为标量，加载时无需pickle）
+        end_time = time.time()
         save_dict = {
-            'recording_info': {
-                'start_time': self.start_time,
-                'end_time': time.time(),
-                'scan_count': self.scan_count,
-                'imu_count': self.imu_count,
-                'duration': time.time() - self.start_time if self.start_time else 0
-            }
+            'info_start_time': np.float64(self.start_time or 0),
+            'info_end_time': np.float64(end_time),
+            'info_scan_count': np.int32(self.scan_count),
+            'info_imu_count': np.int32(self.imu_count),
+            'info_duration': np.float64(end_time - self.start_time if self.start_time else 0)
         }
         
-        # 处理扫描数据
-        if self.scan_data:
-            scan_timestamps = np.array([s['timestamp'] for s in self.scan_data])
-            scan_ids = np.array([s['scan_id'] for s in self.scan_data])
-            scan_valid_points = np.array([s['valid_points'] for s in self.scan_data])
-            scan_system_times = np.array([s['system_time'] for s in self.scan_data])
-            
-            # 合并所有点云数据
-            all_points = []
-            scan_indices = []  # 记录每个点属于哪个扫描
-            
-            for i, scan in enumerate(self.scan_data):
-                points = scan['points']
-                all_points.append(points)
-                scan_indices.extend([i] * len(points))
-            
-            if all_points:
-                all_points = np.vstack(all_points)
-                scan_indices = np.array(scan_indices)
-                
-                save_dict.update({
-                    'scan_timestamps': scan_timestamps,
-                    'scan_ids': scan_ids,
-                    'scan_valid_points': scan_valid_points,
-                    'scan_system_times': scan_system_times,
-                    'points': all_points,  # [N, 6] - x,y,z,intensity,time,ring
-                    'point_scan_indices': scan_indices  # 每个点属于哪个扫描
-                })
+        # 处理扫描数据（截取已写入部分）
+        if self.scan_count:
+            n = self.scan_count
+            w = self._points_written
+            save_dict.update({
+                'scan_timestamps': self._scan_ts[:n],
+                'scan_ids': self._scan_ids[:n],
+                'scan_valid_points': self._scan_valid[:n],
+                'scan_system_times': self._scan_sys[:n],
+                # 每个点属于哪个扫描（按各帧点数展开帧序号）
+                'point_scan_indices': np.repeat(np.arange(n, dtype=np.int64), self._scan_valid[:n])
+            })
+            if self.quantize:
+                save_dict.update(quantize_points(self._points_buf[:w]))
+            else:
+                # 点云 [N, 6] - x,y,z,intensity,time,ring 直接由暂存文件转为伴随NPY文件，NPZ中只记录文件名
+                if self._points_buf is None:
+                    # 上次保存后没有新的扫描，直接引用已保存的点云文件
+                    points_name = os.path.basename(self._points_saved_path)
+                else:
+                    self._finalize_points_file(os.path.join(self.output_dir, points_name))
+                save_dict['points_dtype_version'] = np.int32(1)
+                save_dict['points_file'] = np.array(points_name)
         
-        # 处理IMU数据
-        if self.imu_data:
-            imu_timestamps = np.array([i['timestamp'] for i in self.imu_data])
-            imu_ids = np.array([i['imu_id'] for i in self.imu_data])
-            imu_system_times = np.array([i['system_time'] for i in self.imu_data])
-            imu_quaternions = np.array([i['quaternion'] for i in self.imu_data])
-            imu_angular_velocities = np.array([i['angular_velocity'] for i in self.imu_data])
-            imu_linear_accelerations = np.array([i['linear_acceleration'] for i in self.imu_data])
-            
+        # 处理IMU数据（按字段取已写入部分）
+        if self.imu_count:
+            imu = self._imu_buf[:self.imu_count]
             save_dict.update({
-                'imu_timestamps': imu_timestamps,
-                'imu_ids': imu_ids,
-                'imu_system_times': imu_system_times,
-                'imu_quaternions': imu_quaternions,
-                'imu_angular_velocities': imu_angular_velocities,
-                'imu_linear_accelerations': imu_linear_accelerations
+                'imu_timestamps': imu['stamp'],
+                'imu_ids': imu['id'],
+                'imu_system_times': self._imu_sys[:self.imu_count],
+                'imu_quaternions': imu['q'],
+                'imu_angular_velocities': imu['w'],
+                'imu_linear_accelerations': imu['a']
             })
         
-        # 保存到NPZ文件
-        np.savez_compressed(filepath, **save_dict)
+        # 保存到NPZ文件（浮点点云几乎无法压缩，默认直接写入）
+        if self.compress:
+            np.savez_compressed(filepath, **save_dict)
+        else:
+            np.savez(filepath, **save_dict)
         
         print(f"💾 数据已保存到: {filepath}")
+        if 'points_file' in save_dict:
+            print(f"☁️  点云已保存到: {os.path.join(self.output_dir, points_name)}")
         print(f"📊 包含: {self.scan_count}帧扫描, {self.imu_count}个IMU数据")
         
         return filepath
 
+    def receive_packets(self):
+        """
+        非阻塞地接收一批已到达的数据包
+        
+        Returns:
+            list: 数据包的memoryview列表（下次调用时会被覆盖），没有数据时为空列表
+        """
+        if _recvmmsg is None:
+            try:
+                nbytes, addr = self.sock.recvfrom_into(self._rxbuf)
+            except BlockingIOError:
+                return []
+            return [self._rxview[:nbytes]]
+        
+        # 一次取回已到达的数据包（最多recv_batch个）
+        n = _recvmmsg(self.sock.fileno(), self._msgs, self.recv_batch, _MSG_DONTWAIT, None)
+        if n < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):  # 无数据或被信号中断
+                return []
+            raise OSError(err, os.strerror(err))
+        slot = len(self._rxbuf)
+        return [self._slab_view[i * slot:i * slot + self._msgs[i].msg_len] for i in range(n)]
+
     def record(self):
         """开始记录数据"""
         print("🚀 开始记录数据...")
@@ -243,21 +507,28 @@ class LidarDataRecorder:
                     print(f"✅ 达到最大记录时长 ({self.max_duration}秒)")
                     break
                 
-                # 接收数据
-                try:
-                    data, addr = self.sock.recvfrom(10000)
-                except socket.timeout:
+                # 等待数据到达（超时用于定期检查停止条件）
+                readable, _, _ = select.select([self.sock], [], [], 0.1)
+                if not readable:
                     continue
                 
-                # 解析消息类型
-                msgType = struct.unpack("=I", data[:4])[0]
-                
-                if msgType == 101:  # IMU Message
-                    self.process_imu_message(data)
-                elif msgType == 102:  # Scan Message
-                    self.process_scan_message(data)
-                else:
-                    print(f"⚠️  未知消息类型: {msgType}")
+                # 接收数据：逐批取空内核接收队列
+                packets = self.receive_packets()
+                while packets and self.scan_count < self.max_scans:
+                    for data in packets:
+                        if self.scan_count >= self.max_scans:
+                            break
+                        
+                        # 解析消息类型
+                        msgType = self._u_I.unpack_from(data, 0)[0]
+                        
+                        if msgType == 101:  # IMU Message
+                            self.process_imu_message(data)
+                        elif msgType == 102:  # Scan Message
+                            self.process_scan_message(data)
+                        else:
+                            print(f"⚠️  未知消息类型: {msgType}")
+                    packets = self.receive_packets()
                     
         except KeyboardInterrupt:
             print("\n🛑 用户中断记录")
@@ -267,7 +538,10 @@ class LidarDataRecorder:
             self.sock.close()
             
         # 保存数据
-        saved_file = self.save_data()
+        try:
+            saved_file = self.save_data()
+        finally:
+            self.close()
         return saved_file
 
 def load_lidar_data(filepath):
@@ -282,27 +556,33 @@ def load_lidar_data(filepath):
     """
     print(f"📂 加载数据文件: {filepath}")
     
-    data = np.load(filepath, allow_pickle=True)
+    data = np.load(filepath)
     
-    # 提取信息
-    info = data['recording_info'].item()
-    print(f"📊 记录信息:")
-    print(f"   时长: {info['duration']:.2f}秒")
-    print(f"   扫描帧数: {info['scan_count']}")
-    print(f"   IMU数据: {info['imu_count']}")
+    # 提取信息（早期文件以pickle字典保存记录信息，不加载，只跳过显示）
+    if 'info_duration' in data:
+        print(f"📊 记录信息:")
+        print(f"   时长: {float(data['info_duration']):.2f}秒")
+        print(f"   扫描帧数: {int(data['info_scan_count'])}")
+        print(f"   IMU数据: {int(data['info_imu_count'])}")
     
-    if 'points' in data:
-        points = data['points']
+    # 早期文件中pickle保存的 recording_info 需要 allow_pickle 才能读取，跳过
+    result = {key: data[key] for key in data.files if key != 'recording_info'}
+    
+    points = load_points(data, filepath)
+    if points is not None:
+        result['points'] = points
         print(f"   总点数: {len(points)}")
         print(f"   点云字段: x, y, z, intensity, time, ring")
     
-    return {key: data[key] for key in data.files}
+    return result
 
 def main():
     parser = argparse.ArgumentParser(description='Unitree激光雷达数据记录器')
     parser.add_argument('--output-dir', default='../data', help='输出目录 (默认: ../data)')
     parser.add_argument('--max-scans', type=int, default=1000, help='最大记录扫描数 (默认: 1000)')
     parser.add_argument('--max-duration', type=int, default=60, help='最大记录时长(秒) (默认: 60)')
+    parser.add_argument('--compress', action='store_true', help='压缩保存NPZ文件 (较慢)')
+    parser.add_argument('--quantize', action='store_true', help='量化保存点云 (float16坐标, 文件更小)')
     parser.add_argument('--load', type=str, help='加载并显示指定NPZ文件的信息')
     
     args = parser.parse_args()
@@ -312,13 +592,14 @@ def main():
         load_lidar_data(args.load)
     else:
         # 记录模式
-        recorder = LidarDataRecorder(
+        with LidarDataRecorder(
             output_dir=args.output_dir,
             max_scans=args.max_scans,
-            max_duration=args.max_duration
-        )
-        
-        saved_file = recorder.record()
+            max_duration=args.max_duration,
+            compress=args.compress,
+            quantize=args.quantize
+        ) as recorder:
+            saved_file = recorder.record()
         
         if saved_file:
             print("\n" + "="*60)
@@ -328,8 +609,11 @@ def main():
             print(f"   python {__file__} --load {saved_file}")
             print("\n🐍 Python加载示例:")
             print("   import numpy as np")
-            print(f"   data = np.load('{saved_file}', allow_pickle=True)")
-            print("   points = data['points']  # 点云数据 [N, 6]")
+            print(f"   data = np.load('{saved_file}')")
+            if args.quantize:
+                print(f"   points = load_points(data, '{saved_file}')  # 点云数据 [N, 6]")
+            else:
+                print(f"   points = np.load('{saved_file[:-4]}_points.npy', mmap_mode='r')  # 点云数据 [N, 6]")
             print("   scan_timestamps = data['scan_timestamps']  # 扫描时间戳")
 
 if __name__ == "__main__":
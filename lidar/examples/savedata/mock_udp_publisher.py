@@ -11,17 +11,28 @@ import socket
 import struct
 import time
 import numpy as np
-import math
 
 # UDP配置
 UDP_IP = "127.0.0.1"
 UDP_PORT = 12345
 
+# 点数据类型（与 "=fffffI" 布局一致）
+POINT_DTYPE = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+                        ('intensity', '<f4'), ('time', '<f4'), ('ring', '<u4')])
+
 class MockUDPPublisher:
     def __init__(self):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.scan_id = 0
         self.imu_id = 0
+        # 随机数生成器：每帧一次性生成整帧的噪声
+        self.rng = np.random.default_rng()
+        
+        # 预编译的报文头/IMU打包器和复用的发送缓冲区
+        self._scan_header = struct.Struct("=IIdII")  # msg_type, length, timestamp, id, validPointsNum
+        self._imu_message = struct.Struct("=II" + "dI4f3f3f")
+        self._scan_buf = bytearray(self._scan_header.size + 120 * POINT_DTYPE.itemsize)
+        self._imu_buf = bytearray(self._imu_message.size)
         
         print(f"🤖 模拟UDP发布器启动")
         print(f"📡 发送地址: {UDP_IP}:{UDP_PORT}")
@@ -34,27 +45,25 @@ class MockUDPPublisher:
         timestamp = time.time()
         
         # 模拟一个圆形扫描模式
-        num_points = np.random.randint(80, 120)  # 随机点数
+        num_points = self.rng.integers(80, 120)  # 随机点数
         angles = np.linspace(0, 2*np.pi, num_points)
         
-        points = []
-        for i, angle in enumerate(angles):
-            # 模拟距离变化
-            distance = 2.0 + 0.5 * math.sin(angle * 3) + np.random.normal(0, 0.1)
-            
-            x = distance * math.cos(angle)
-            y = distance * math.sin(angle)
-            z = 0.1 * math.sin(angle * 5) + np.random.normal(0, 0.02)  # 轻微高度变化
-            
-            intensity = 200 + 50 * math.sin(angle * 2) + np.random.normal(0, 10)
-            intensity = max(0, min(255, intensity))  # 限制范围
-            
-            point_time = i * 0.0001  # 模拟点的时间偏移
-            ring = 0  # 单线激光雷达
-            
-            points.append([x, y, z, intensity, point_time, ring])
-        
-        return timestamp, self.scan_id, len(points), points
+        points = np.empty(num_points, dtype=POINT_DTYPE)
+        
+        # 模拟距离变化
+        distance = 2.0 + 0.5 * np.sin(angles * 3) + self.rng.standard_normal(num_points) * 0.1
+        
+        points['x'] = distance * np.cos(angles)
+        points['y'] = distance * np.sin(angles)
+        points['z'] = 0.1 * np.sin(angles * 5) + self.rng.standard_normal(num_points) * 0.02  # 轻微高度变化
+        
+        intensity = 200 + 50 * np.sin(angles * 2) + self.rng.standard_normal(num_points) * 10.0
+        points['intensity'] = np.clip(intensity, 0, 255)  # 限制范围
+        
+        points['time'] = np.arange(num_points) * 0.0001  # 模拟点的时间偏移
+        points['ring'] = 0  # 单线激光雷达
+        
+        return timestamp, self.scan_id, num_points, points
 
     def create_mock_imu(self):
         """创建模拟IMU数据"""
@@ -80,21 +89,19 @@ class MockUDPPublisher:
         msg_type = 102  # Scan message type
         
         # 计算消息长度
-        point_data_str = "=fffffI"
-        point_size = struct.calcsize(point_data_str)
         header_size = 16  # timestamp(8) + id(4) + validPointsNum(4)
-        msg_length = header_size + num_points * point_size
+        msg_length = header_size + num_points * POINT_DTYPE.itemsize
         
-        # 打包消息
-        message = struct.pack("=II", msg_type, msg_length)
-        message += struct.pack("=dII", timestamp, scan_id, num_points)
-        
-        for point in points:
-            x, y, z, intensity, point_time, ring = point
-            message += struct.pack(point_data_str, x, y, z, intensity, point_time, ring)
+        # 打包消息：报文头和点数据直接写入复用的发送缓冲区
+        total = self._scan_header.size + points.nbytes
+        if total > len(self._scan_buf):
+            self._scan_buf = bytearray(total)
+        self._scan_header.pack_into(self._scan_buf, 0, msg_type, msg_length, timestamp, scan_id, num_points)
+        view = memoryview(self._scan_buf)
+        view[self._scan_header.size:total] = points.view(np.uint8)
         
         # 发送
-        self.sock.sendto(message, (UDP_IP, UDP_PORT))
+        self.sock.sendto(view[:total], (UDP_IP, UDP_PORT))
         print(f"📊 发送扫描 #{scan_id}: {num_points}点, 时间戳={timestamp:.6f}")
 
     def send_imu_message(self):
@@ -103,19 +110,18 @@ class MockUDPPublisher:
         
         # 构建消息
         msg_type = 101  # IMU message type
-        imu_data_str = "=dI4f3f3f"
-        msg_length = struct.calcsize(imu_data_str)
+        msg_length = self._imu_message.size - 8
         
         # 打包消息
-        message = struct.pack("=II", msg_type, msg_length)
-        message += struct.pack(imu_data_str, 
-                              timestamp, imu_id,
-                              *quaternion,
-                              *angular_velocity, 
-                              *linear_acceleration)
+        self._imu_message.pack_into(self._imu_buf, 0,
+                                    msg_type, msg_length,
+                                    timestamp, imu_id,
+                                    *quaternion,
+                                    *angular_velocity,
+                                    *linear_acceleration)
         
         # 发送
-        self.sock.sendto(message, (UDP_IP, UDP_PORT))
+        self.sock.sendto(self._imu_buf, (UDP_IP, UDP_PORT))
         print(f"🧭 发送IMU #{imu_id}: 时间戳={timestamp:.6f}")
 
     def run(self, duration=60, scan_rate=10, imu_rate=100):
@@ -131,29 +137,40 @@ class MockUDPPublisher:
         print(f"📊 扫描频率: {scan_rate} Hz")
         print(f"🧭 IMU频率: {imu_rate} Hz")
         
-        start_time = time.time()
-        last_scan_time = 0
-        last_imu_time = 0
-        
         scan_interval = 1.0 / scan_rate
         imu_interval = 1.0 / imu_rate
         
+        # 单调时钟调度：按固定节拍计算下一次发送时刻，休眠到最近的时刻为止
+        start_time = time.monotonic()
+        end_time = start_time + duration
+        next_scan = start_time
+        next_imu = start_time
+        
         try:
-            while time.time() - start_time < duration:
-                current_time = time.time()
+            while True:
+                now = time.monotonic()
+                if now >= end_time:
+                    break
+                
+                due = min(next_scan, next_imu, end_time)
+                if due > now:
+                    time.sleep(due - now)
+                    continue
                 
                 # 发送扫描数据
-                if current_time - last_scan_time >= scan_interval:
+                if next_scan <= now:
                     self.send_scan_message()
-                    last_scan_time = current_time
+                    next_scan += scan_interval
+                    # 落后超过一个周期时不补发，从当前时刻重新对齐
+                    if next_scan < now:
+                        next_scan = now + scan_interval
                 
                 # 发送IMU数据
-                if current_time - last_imu_time >= imu_interval:
+                if next_imu <= now:
                     self.send_imu_message()
-                    last_imu_time = current_time
-                
-                # 短暂休眠
-                time.sleep(0.001)
+                    next_imu += imu_interval
+                    if next_imu < now:
+                        next_imu = now + imu_interval
                 
         except KeyboardInterrupt:
             print("\n🛑 用户中断")
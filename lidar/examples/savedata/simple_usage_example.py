@@ -9,6 +9,7 @@
 
 import numpy as np
 import os
+from lidar_data_recorder import load_points
 
 def load_lidar_data(npz_file):
     """
@@ -22,10 +23,10 @@ def load_lidar_data(npz_file):
     """
     print(f"📂 加载数据: {npz_file}")
     
-    data = np.load(npz_file, allow_pickle=True)
+    data = np.load(npz_file)
     
     # 提取点云数据
-    points = data['points']  # [N, 6] - x, y, z, intensity, time, ring
+    points = load_points(data, npz_file)  # [N, 6] - x, y, z, intensity, time, ring
     scan_timestamps = data['scan_timestamps']
     scan_ids = data['scan_ids']
     
@@ -67,8 +68,9 @@ def basic_point_cloud_processing(points):
     print(f"            Y[{xyz[:, 1].min():.2f}, {xyz[:, 1].max():.2f}]")
     print(f"            Z[{xyz[:, 2].min():.2f}, {xyz[:, 2].max():.2f}]")
     
-    # 计算距离
-    distances = np.sqrt(np.sum(xyz**2, axis=1))
+    # 计算距离（einsum 直接求平方和，不生成 xyz**2 临时数组）
+    distances = np.einsum('ij,ij->i', xyz, xyz)
+    np.sqrt(distances, out=distances)
     print(f"   距离范围: [{distances.min():.2f}, {distances.max():.2f}] 米")
     print(f"   平均距离: {distances.mean():.2f} 米")
     
@@ -91,10 +93,10 @@ def filter_points_by_distance(points, min_dist=0.5, max_dist=10.0):
         filtered_points: 过滤后的点云
     """
     xyz = points[:, :3]
-    distances = np.sqrt(np.sum(xyz**2, axis=1))
+    sq_distances = np.einsum('ij,ij->i', xyz, xyz)
     
-    # 距离过滤
-    mask = (distances >= min_dist) & (distances <= max_dist)
+    # 距离过滤（与距离阈值的平方比较，无需开方）
+    mask = (sq_distances >= min_dist**2) & (sq_distances <= max_dist**2)
     filtered_points = points[mask]
     
     print(f"🔍 距离过滤 [{min_dist}, {max_dist}]米:")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+数据记录器点云伴随文件的往返测试
+
+运行: python -m unittest test_lidar_data_recorder
+"""
+
+import contextlib
+import io
+import os
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+from lidar_data_recorder import LidarDataRecorder, load_lidar_data
+
+
+def make_scan_message(scan_id, points):
+    """按记录器的报文格式打包一帧扫描消息（points 为 [N, 6] float32）"""
+    body = np.empty(len(points), dtype=[('f', '<f4', 5), ('ring', '<u4')])
+    body['f'] = points[:, :5]
+    body['ring'] = points[:, 5]
+    header = struct.pack("=IIdII", 102, 0, 1000.0 + scan_id, scan_id, len(points))
+    return header + body.tobytes()
+
+
+class CompanionPointsFileTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.rng = np.random.default_rng(0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.recorder = LidarDataRecorder(output_dir=self.tmpdir.name, max_scans=2)
+        self.recorder.sock.close()
+
+    def tearDown(self):
+        self.recorder.close()
+        self.tmpdir.cleanup()
+
+    def feed_scans(self, count):
+        """向记录器输入 count 帧随机扫描，返回输入的点云"""
+        scans = []
+        for _ in range(count):
+            points = self.rng.uniform(0, 50, (int(self.rng.integers(100, 200)), 6)).astype(np.float32)
+            points[:, 5] = np.rint(points[:, 5])
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.recorder.process_scan_message(make_scan_message(self.recorder.scan_count, points))
+            scans.append(points)
+        return np.concatenate(scans)
+
+    def save_and_load(self, prefix):
+        with contextlib.redirect_stdout(io.StringIO()):
+            filepath = self.recorder.save_data(prefix)
+            return filepath, load_lidar_data(filepath)
+
+    def scratch_files(self):
+        return [name for name in os.listdir(self.tmpdir.name) if name.startswith('.points_')]
+
+    def test_round_trip(self):
+        # 5帧超过预估容量（2帧 x 150点），同时覆盖暂存文件扩容
+        expected = self.feed_scans(5)
+        filepath, data = self.save_and_load('run')
+
+        points_path = os.path.join(self.tmpdir.name, 'run_points.npy')
+        self.assertEqual(str(np.load(filepath)['points_file']), 'run_points.npy')
+        # 暂存文件已截断到实际行数
+        saved = np.load(points_path, mmap_mode='r')
+        self.assertEqual(os.path.getsize(points_path), saved.offset + expected.nbytes)
+        del saved
+        self.assertIsInstance(data['points'], np.memmap)
+        np.testing.assert_array_equal(data['points'], expected)
+        np.testing.assert_array_equal(np.load(points_path), expected)
+        np.testing.assert_array_equal(np.bincount(data['point_scan_indices']),
+                                      data['scan_valid_points'])
+        self.assertEqual(self.scratch_files(), [])
+
+    def test_save_twice_and_continue(self):
+        first = self.feed_scans(2)
+        self.save_and_load('first')
+        # 没有新扫描时再次保存，引用上次的点云文件
+        _, data = self.save_and_load('again')
+        np.testing.assert_array_equal(data['points'], first)
+
+        # 保存后继续接收，下一次保存包含全部点云
+        second = self.feed_scans(3)
+        _, data = self.save_and_load('second')
+        np.testing.assert_array_equal(data['points'], np.concatenate([first, second]))
+        self.assertEqual(len(data['scan_timestamps']), 5)
+
+    def test_close_removes_scratch_file(self):
+        self.feed_scans(1)
+        self.assertEqual(len(self.scratch_files()), 1)
+        self.recorder.close()
+        self.assertEqual(os.listdir(self.tmpdir.name), [])
+
+
+class LegacyFileTest(unittest.TestCase):
+    def test_load_pickled_recording_info(self):
+        # 早期文件：记录信息为pickle字典，点云直接存于NPZ
+        points = np.arange(12, dtype=np.float32).reshape(2, 6)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepath = os.path.join(tmpdir, 'legacy.npz')
+            np.savez(filepath, recording_info={'duration': 1.0, 'scan_count': 1, 'imu_count': 0},
+                     points=points, scan_timestamps=np.zeros(1))
+            with contextlib.redirect_stdout(io.StringIO()):
+                data = load_lidar_data(filepath)
+        self.assertNotIn('recording_info', data)
+        np.testing.assert_array_equal(data['points'], points)
+
+
+if __name__ == "__main__":
+    unittest.main()